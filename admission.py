@@ -0,0 +1,96 @@
+"""
+Admission control for login- and refresh-triggered scrapes
+Every admitted scrape costs a Chrome instance, so a retry loop or a misbehaving client
+must not be able to start them at will. A scrape is admitted only when the number of
+pending scrapes (counted in the database, across processes) is under a global cap and
+both the client IP's and the roll number's token buckets, kept per process, have a
+token left. Rejected requests are served the stored data instead.
+"""
+
+import os
+import threading
+import time
+
+import metrics
+
+class TokenBuckets:
+    """One token bucket per key: `capacity` requests in a burst, refilled evenly over `refill_seconds`"""
+
+    def __init__(self, capacity, refill_seconds, max_keys=10000):
+        self.capacity = capacity
+        self.rate = capacity / refill_seconds
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Take a token for key; returns False when its bucket is empty"""
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._tokens(key, now)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return False
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return True
+
+    def give_back(self, key):
+        """Return a token taken for a request that was rejected by a later check"""
+        now = time.monotonic()
+        with self._lock:
+            self._buckets[key] = (min(self._tokens(key, now) + 1, self.capacity), now)
+
+    def _tokens(self, key, now):
+        tokens, updated_at = self._buckets.get(key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - updated_at) * self.rate)
+
+    def _prune(self, now):
+        # Buckets that have refilled completely behave exactly like missing ones
+        for key in [key for key in self._buckets if self._tokens(key, now) >= self.capacity]:
+            del self._buckets[key]
+
+class AdmissionControl:
+    """Per-IP and per-roll-number rate limits plus a global cap on pending scrapes"""
+
+    def __init__(self, ip_burst=20, ip_refill_seconds=60, roll_burst=3, roll_refill_seconds=600,
+                 max_pending=8):
+        self.ip_buckets = TokenBuckets(ip_burst, ip_refill_seconds)
+        self.roll_buckets = TokenBuckets(roll_burst, roll_refill_seconds)
+        self.max_pending = max_pending
+
+    @classmethod
+    def from_env(cls):
+        """Build admission control configured by ERP_ADMISSION_* environment variables"""
+        return cls(
+            ip_burst=int(os.environ.get('ERP_ADMISSION_IP_BURST', 20)),
+            ip_refill_seconds=float(os.environ.get('ERP_ADMISSION_IP_REFILL_SECONDS', 60)),
+            roll_burst=int(os.environ.get('ERP_ADMISSION_ROLL_BURST', 3)),
+            roll_refill_seconds=float(os.environ.get('ERP_ADMISSION_ROLL_REFILL_SECONDS', 600)),
+            max_pending=int(os.environ.get('ERP_MAX_PENDING_SCRAPES', 8)),
+        )
+
+    def admit(self, ip_address, roll_number, pending):
+        """
+        Decide whether a new scrape may start while `pending` scrapes are queued or running
+        Returns None when admitted, otherwise the rejecting check: 'pending', 'ip' or 'roll'.
+        """
+        reason = None
+        if pending >= self.max_pending:
+            reason = 'pending'
+        elif not self.ip_buckets.take(ip_address):
+            reason = 'ip'
+        elif not self.roll_buckets.take(roll_number):
+            self.ip_buckets.give_back(ip_address)
+            reason = 'roll'
+
+        if reason:
+            metrics.increment('admission.rejected')
+            metrics.increment(f'admission.rejected.{reason}')
+        else:
+            metrics.increment('admission.admitted')
+        return reason
+
+# Shared by every request handled by this process
+scrape_admission = AdmissionControl.from_env()
@@ -1,28 +1,122 @@
-from flask import Flask, render_template, redirect, request, url_for, session, flash, jsonify
+from flask import Flask, Blueprint, current_app, render_template, redirect, request, url_for, session, flash, jsonify, Response, stream_with_context
 from werkzeug.security import check_password_hash, generate_password_hash
+import click
 import os
 import threading
 import time
-from datetime import datetime
+import importlib.util
+import base64
+from functools import wraps
+from datetime import datetime, timedelta
 import json
 
-# Import our database and scraping modules
-from connectdb import init_db, get_student, add_student, update_student_attendance, add_attendance_records, get_student_stats, log_login, get_db_connection
+# Import our database module (scraping runs in a subprocess, see scrape_student_data)
+from connectdb import init_db, ensure_schema, get_student, add_student, update_student_attendance, add_attendance_records, get_student_stats, log_login, mark_student_scraped, save_refresh_credentials, delete_refresh_credentials, LOW_ATTENDANCE_THRESHOLD, create_staff_token, verify_staff_token, iter_bulk_attendance, update_student_info, search_students, search_subjects, enqueue_scrape_job, get_latest_scrape_job, count_pending_scrapes, set_scrape_running, archive_past_terms, get_student_terms, is_archived_term, bulk_scan_end
+from render_cache import render_fragments, prerender_student
+from credentials import credential_storage_available, encrypt_password
+from circuit_breaker import erp_breaker, OPEN
+from admission import scrape_admission
+import metrics
+import fastjson
+from scrape_watchdog import run_isolated, TIMEOUT_SECONDS
 
-try:
-    from scrapp import scrape_student_data
-    SCRAPING_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: Scraping module not available: {e}")
-    SCRAPING_AVAILABLE = False
-    def scrape_student_data(roll_number, password):
+# Only check that the scraping dependencies exist; Selenium and BeautifulSoup are
+# imported on the first scrape so that web workers which never scrape don't pay for them
+SCRAPING_AVAILABLE = all(importlib.util.find_spec(module) is not None for module in ('selenium', 'bs4'))
+if not SCRAPING_AVAILABLE:
+    print("Warning: Scraping module not available: selenium or bs4 is not installed")
+
+def scrape_student_data(roll_number, password, previous_fingerprint=None):
+    """Run the scraper in a watched subprocess with a deadline and memory limit (see scrape_watchdog.py)"""
+    if not SCRAPING_AVAILABLE:
         return None
+    return run_isolated(roll_number, password, previous_fingerprint)
+
+# Routes, CLI commands and error handlers; create_app() is the only place an app is built,
+# so `flask run`, `gunicorn 'app:create_app()'` and python app.py all go through its checks
+bp = Blueprint('erp', __name__, cli_group=None)
+
+def create_app(config=None):
+    """Application factory: prepare the database schema once, check the configuration and return the app"""
+    app = Flask(__name__)
+    app.secret_key = 'your-secret-key-change-this-in-production'
+
+    # Render a student's cached page fragments as soon as a scrape commits, instead of on the next page view
+    app.config['PRERENDER_FRAGMENTS'] = False
+
+    # 'thread' scrapes inside this process; 'queue' only enqueues jobs for scrape_worker.py processes
+    app.config['SCRAPE_MODE'] = os.environ.get('ERP_SCRAPE_MODE', 'thread')
+
+    if config:
+        app.config.update(config)
+
+    ensure_schema()
+    if app.config['SCRAPE_MODE'] == 'queue' and not credential_storage_available():
+        raise RuntimeError("ERP_SCRAPE_MODE=queue needs ERP_CREDENTIAL_KEY to pass passwords to workers")
+
+    app.register_blueprint(bp)
+    return app
+
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create or upgrade the database schema (run once per deployment)"""
+    init_db()
+    print("Database initialized successfully!")
 
-app = Flask(__name__)
-app.secret_key = 'your-secret-key-change-this-in-production'
+@bp.cli.command('refresh-scheduler')
+def refresh_scheduler_command():
+    """Re-scrape opted-in students in the background, most urgent first"""
+    from refresh_scheduler import RefreshScheduler
+    ensure_schema()
+    app = current_app._get_current_object()
 
-# Initialize database
-init_db()
+    def scrape_job(roll_number, password):
+        scrape_data_background(roll_number, password, app)
+        return scraping_status.pop(roll_number, {})
+
+    RefreshScheduler.from_env(scrape_job).run_forever()
+
+@bp.cli.command('create-staff-token')
+@click.argument('name')
+def create_staff_token_command(name):
+    """Create an API token for staff tools using /api/staff/attendance"""
+    ensure_schema()
+    print(create_staff_token(name))
+
+@bp.cli.command('archive-terms')
+@click.option('--current-term', help='Archive every other term (default: whatever differs from each student\'s term)')
+def archive_terms_command(current_term):
+    """Move past terms' attendance records into the compressed archive"""
+    ensure_schema()
+    print(f"Archived {archive_past_terms(current_term)} attendance records")
+
+@bp.cli.command('db-maintenance')
+@click.option('--once', is_flag=True, help='Run one backup and vacuum/ANALYZE pass, then exit')
+@click.option('--enable-incremental-vacuum', is_flag=True,
+              help='Convert an existing database to auto_vacuum=INCREMENTAL (one blocking VACUUM)')
+def db_maintenance_command(once, enable_incremental_vacuum):
+    """Back up, vacuum and ANALYZE the SQLite database in small time slices"""
+    import db_maintenance
+    from connectdb import backend
+    if backend.name != 'sqlite':
+        raise click.ClickException('db-maintenance is for SQLite; PostgreSQL uses autovacuum and pg_dump')
+    ensure_schema()
+    if enable_incremental_vacuum:
+        converted = db_maintenance.enable_incremental_vacuum()
+        print("Converted to incremental vacuum" if converted else "Already using incremental vacuum")
+        return
+    scheduler = db_maintenance.MaintenanceScheduler.from_env()
+    if once:
+        scheduler.tick()
+    else:
+        scheduler.run_forever()
+
+# Upper bound on records per bulk API request, whatever `limit` asks for
+BULK_PAGE_MAX = 1000
+
+# Upper bound on records a bulk API request examines; a selective filter may return a short
+# (even empty) page with a next_cursor to carry on from
+BULK_SCAN_ROWS = int(os.environ.get('ERP_BULK_SCAN_ROWS', 5000))
 
 # Store scraping status for each user
 scraping_status = {}
@@ -69,68 +163,171 @@ def create_sample_data(roll_number):
         'medical_attendance': 90.0
     }
 
-def scrape_data_background(roll_number, password):
-    """Background task to scrape student data"""
+def scrape_data_background(roll_number, password, app=None):
+    """Background task to scrape student data; app, when given, is used to pre-render fragments"""
+    student = None
     try:
         scraping_status[roll_number] = {'status': 'scraping', 'progress': 0}
         
+        # Get student from database; its stored fingerprint lets the scraper skip unchanged pages
+        student = get_student(roll_number)
+        if not student:
+            scraping_status[roll_number] = {'status': 'error', 'message': 'Student not found in database'}
+            return
+        
+        # Counted by admission control in every process until the finally below
+        set_scrape_running(student['id'], True)
+        
         # Check if scraping is available
         if not SCRAPING_AVAILABLE:
             # Create sample data for testing
             scraping_status[roll_number]['progress'] = 50
             scraped_data = create_sample_data(roll_number)
         else:
+            # Fail fast while the ERP is known to be down; the stored data is served meanwhile
+            if not erp_breaker.allow_request():
+                scraping_status[roll_number] = stale_status(student)
+                return
+            
             # Simulate scraping process
             scraping_status[roll_number]['progress'] = 25
             
             # Call the actual scraping function
-            scraped_data = scrape_student_data(roll_number, password)
-        
-        if scraped_data:
-            # Get student from database
-            student = get_student(roll_number)
-            if student:
-                # Update student info with scraped data
-                student_info = scraped_data.get('student_info', {})
-                if student_info:
-                    # Update student details in database
-                    conn = get_db_connection()
-                    conn.execute('''
-                        UPDATE students 
-                        SET name = ?, institution = ?, academic_career = ?, term = ?,
-                            total_attendance_percent = ?, medical_attendance_percent = ?
-                        WHERE roll_number = ?
-                    ''', (
-                        student_info.get('name', student['name']),
-                        student_info.get('institution', student['institution']),
-                        student_info.get('academic_career', student['academic_career']),
-                        student_info.get('term', student['term']),
-                        scraped_data.get('total_attendance', 0),
-                        scraped_data.get('medical_attendance', 0),
-                        roll_number
-                    ))
-                    conn.commit()
-                    conn.close()
-                
-                # Add attendance records
-                records = scraped_data.get('records', [])
-                add_attendance_records(student['id'], records)
-                
-                scraping_status[roll_number] = {'status': 'completed', 'progress': 100}
+            started = time.perf_counter()
+            try:
+                scraped_data = scrape_student_data(roll_number, password, student['page_fingerprint'])
+            except Exception as e:
+                # Killed by the watchdog (hung driver, runaway memory, crash) or the scrape process could
+                # not run at all; either way the breaker hears about it, or a half-open probe never ends
+                erp_breaker.record_failure(time.perf_counter() - started)
+                metrics.increment('scrape.failed')
+                scraping_status[roll_number] = {'status': 'error', 'message': str(e)}
+                return
+            if scraped_data:
+                erp_breaker.record_success(time.perf_counter() - started)
             else:
-                scraping_status[roll_number] = {'status': 'error', 'message': 'Student not found in database'}
-        else:
+                erp_breaker.record_failure(time.perf_counter() - started)
+        
+        if not scraped_data:
+            metrics.increment('scrape.failed')
             scraping_status[roll_number] = {'status': 'error', 'message': 'Failed to scrape data'}
+            return
+        
+        if scraped_data.get('login_failed'):
+            # The ERP answered but rejected the password; the refresh scheduler counts these
+            metrics.increment('scrape.login_failed')
+            scraping_status[roll_number] = {'status': 'error', 'login_failed': True,
+                                            'message': 'The ERP portal rejected the roll number or password'}
+            return
+        
+        metrics.increment('scrape.succeeded')
+        if scraped_data.get('unchanged'):
+            # Same table and summary as last time: nothing was parsed, nothing to write
+            metrics.increment('scrape.unchanged_skipped')
+            mark_student_scraped(student['id'])
+            scraping_status[roll_number] = {'status': 'completed', 'progress': 100}
+            return
+        
+        # Update student info with scraped data
+        student_info = scraped_data.get('student_info', {})
+        if student_info:
+            # Update student details in database
+            update_student_info(
+                roll_number,
+                student_info.get('name', student['name']),
+                student_info.get('institution', student['institution']),
+                student_info.get('academic_career', student['academic_career']),
+                student_info.get('term', student['term']),
+                scraped_data.get('total_attendance', 0),
+                scraped_data.get('medical_attendance', 0)
+            )
+        
+        # Add attendance records
+        records = scraped_data.get('records', [])
+        if not add_attendance_records(student['id'], records):
+            # Keep the old fingerprint, or the next scrape of this same page would be skipped as unchanged
+            metrics.increment('scrape.write_failed')
+            scraping_status[roll_number] = {'status': 'error', 'message': 'Failed to save attendance records'}
+            return
+        mark_student_scraped(student['id'], scraped_data.get('fingerprint'))
+        
+        if app is not None and app.config['PRERENDER_FRAGMENTS']:
+            with app.app_context():
+                prerender_student(student['id'])
+        
+        scraping_status[roll_number] = {'status': 'completed', 'progress': 100}
             
     except Exception as e:
         scraping_status[roll_number] = {'status': 'error', 'message': str(e)}
+    finally:
+        if student:
+            set_scrape_running(student['id'], False)
+
+def stale_status(student):
+    """Scraping status for when the ERP is unavailable and stored data is served instead"""
+    return {
+        'status': 'stale',
+        'message': 'The ERP portal is not responding, showing stored data',
+        'last_updated': student['last_scraped_at']
+    }
+
+def job_status(job):
+    """Scraping status for a queued scrape job, in the same shape as scraping_status entries"""
+    if job is None:
+        return None
+    if job['status'] == 'done':
+        return {'status': 'completed', 'progress': 100}
+    if job['status'] == 'failed':
+        return {'status': 'error', 'message': job['error'] or 'Failed to scrape data'}
+    return {'status': 'scraping', 'progress': 25 if job['status'] == 'running' else 0}
+
+def throttled_status(student):
+    """Scraping status when admission control turned a scrape away"""
+    return {
+        'status': 'throttled',
+        'message': 'Too many refresh requests right now, showing stored data',
+        'last_updated': student['last_scraped_at']
+    }
+
+def pending_scrapes():
+    """Scrapes queued or running across every web worker, scrape worker and the refresh scheduler"""
+    # The watchdog kills a scrape at TIMEOUT_SECONDS, so older markers were left by a dead process
+    started_after = datetime.utcnow() - timedelta(seconds=TIMEOUT_SECONDS + 60)
+    return count_pending_scrapes(started_after.strftime('%Y-%m-%d %H:%M:%S'))
 
-@app.route('/')
+def admit_scrape(roll_number):
+    """Ask admission control whether this client may start a scrape for roll_number"""
+    return scrape_admission.admit(request.remote_addr, roll_number, pending_scrapes()) is None
+
+def start_background_scrape(roll_number, password):
+    """Start a scrape thread (or queue a job) unless the ERP circuit breaker is open; returns whether one started"""
+    if erp_breaker.state == OPEN:
+        student = get_student(roll_number)
+        if student:
+            scraping_status[roll_number] = stale_status(student)
+        return False
+    
+    if current_app.config['SCRAPE_MODE'] == 'queue':
+        student = get_student(roll_number)
+        enqueue_scrape_job(student['id'], roll_number, encrypt_password(password))
+        scraping_status.pop(roll_number, None)
+        metrics.increment('scrape.enqueued')
+        return True
+    
+    # Reported as scraping from now on, not only once the thread runs
+    scraping_status[roll_number] = {'status': 'scraping', 'progress': 0}
+    scraping_thread = threading.Thread(target=scrape_data_background,
+                                       args=(roll_number, password, current_app._get_current_object()))
+    scraping_thread.daemon = True
+    scraping_thread.start()
+    return True
+
+@bp.route('/')
 def login():
     """Render login page"""
-    return render_template('login.html')
+    return render_template('login.html', background_refresh_available=credential_storage_available())
 
-@app.route('/login_handler', methods=['POST'])
+@bp.route('/login_handler', methods=['POST'])
 def login_handler():
     """Handle login form submission"""
     roll_number = request.form.get('sid', '').strip()
@@ -138,106 +335,131 @@ def login_handler():
     
     if not roll_number or not password:
         flash('Please enter both roll number and password', 'error')
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     
     # Check if student exists in database
     student = get_student(roll_number)
     
-    if not student:
+    new_student = not student
+    if new_student:
+        # A new roll number has no stored data to fall back on, so a rejected scrape means no login
+        if not admit_scrape(roll_number):
+            flash('Too many login attempts right now. Please try again in a few minutes.', 'error')
+            return redirect(url_for('.login'))
+        
         # Try to add new student with hashed password
         hashed_password = generate_password_hash(password)
         if not add_student(roll_number, hashed_password):
             flash('Invalid credentials. Please check your roll number and password.', 'error')
-            return redirect(url_for('login'))
+            return redirect(url_for('.login'))
         student = get_student(roll_number)
     
     # Verify password
     if not check_password_hash(student['password'], password):
         flash('Invalid credentials. Please check your roll number and password.', 'error')
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     
     # Log the login
     log_login(student['id'], request.remote_addr, request.headers.get('User-Agent', ''))
     
+    # Background refresh needs the ERP password, so it is only stored when the student opts in
+    if request.form.get('background_refresh') and credential_storage_available():
+        save_refresh_credentials(student['id'], encrypt_password(password))
+    else:
+        delete_refresh_credentials(student['id'])
+    
     # Store student info in session
     session['student_id'] = student['id']
     session['roll_number'] = roll_number
     session['student_name'] = student['name'] or 'Student'
     
-    # Start background scraping
-    scraping_thread = threading.Thread(target=scrape_data_background, args=(roll_number, password))
-    scraping_thread.daemon = True
-    scraping_thread.start()
+    # Start background scraping (a new student was already admitted above)
+    if not new_student and not admit_scrape(roll_number):
+        if scraping_status.get(roll_number, {}).get('status') != 'scraping':
+            scraping_status[roll_number] = throttled_status(student)
+        flash('Too many refresh requests right now. Showing your data from the last update; try again in a few minutes.', 'info')
+    elif not start_background_scrape(roll_number, password):
+        flash('The ERP portal is not responding right now. Showing your data from the last update.', 'info')
     
-    return redirect(url_for('attendance_page'))
+    return redirect(url_for('.attendance_page'))
 
-@app.route('/attendance')
+@bp.route('/attendance')
 def attendance_page():
     """Render attendance page"""
     if 'student_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     
     student_id = session['student_id']
     stats = get_student_stats(student_id)
     
     if not stats['student']:
         flash('Student data not found', 'error')
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
+    
+    fragments = render_fragments(['attendance_table'], stats['student'], stats['attendance_records'])
     
     return render_template('attendance.html', 
                          student=stats['student'],
                          attendance_records=stats['attendance_records'],
-                         login_history=stats['login_history'])
+                         login_history=stats['login_history'],
+                         fragments=fragments,
+                         erp_unavailable=erp_breaker.state == OPEN)
 
-@app.route('/scraping_status')
+@bp.route('/scraping_status')
 def get_scraping_status():
     """Get scraping status for current user"""
     if 'roll_number' not in session:
         return jsonify({'error': 'Not logged in'})
     
     roll_number = session['roll_number']
-    status = scraping_status.get(roll_number, {'status': 'not_started'})
-    return jsonify(status)
+    status = scraping_status.get(roll_number)
+    if status is None and current_app.config['SCRAPE_MODE'] == 'queue':
+        status = job_status(get_latest_scrape_job(session['student_id']))
+    return jsonify(status or {'status': 'not_started'})
 
-@app.route('/refresh_data')
+@bp.route('/refresh_data')
 def refresh_data():
     """Refresh student data by re-scraping"""
     if 'student_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     
     roll_number = session['roll_number']
     password = request.form.get('password', '')
     
     if not password:
         flash('Please enter your password to refresh data', 'error')
-        return redirect(url_for('attendance_page'))
+        return redirect(url_for('.attendance_page'))
+    
+    if not admit_scrape(roll_number):
+        flash('Too many refresh requests right now. Please try again in a few minutes.', 'error')
+        return redirect(url_for('.attendance_page'))
     
     # Start background scraping
-    scraping_thread = threading.Thread(target=scrape_data_background, args=(roll_number, password))
-    scraping_thread.daemon = True
-    scraping_thread.start()
+    if not start_background_scrape(roll_number, password):
+        flash('The ERP portal is not responding right now. Please try again in a few minutes.', 'error')
+        return redirect(url_for('.attendance_page'))
     
     flash('Data refresh started. Please wait a moment and refresh the page.', 'info')
-    return redirect(url_for('attendance_page'))
+    return redirect(url_for('.attendance_page'))
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
     """Render analytics dashboard"""
     if 'student_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     
     student_id = session['student_id']
     stats = get_student_stats(student_id)
     
     if not stats['student']:
         flash('Student data not found', 'error')
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     
     # Calculate some analytics
     records = stats['attendance_records']
     total_subjects = len(records)
     high_attendance = len([r for r in records if r['attendance_percentage'] >= 80])
-    low_attendance = len([r for r in records if r['attendance_percentage'] < 75])
+    low_attendance = len([r for r in records if r['attendance_percentage'] < LOW_ATTENDANCE_THRESHOLD])
     
     analytics = {
         'total_subjects': total_subjects,
@@ -246,47 +468,150 @@ def dashboard():
         'average_attendance': sum(r['attendance_percentage'] for r in records) / total_subjects if total_subjects > 0 else 0
     }
     
+    fragments = render_fragments(['subject_analysis', 'chart_data'], stats['student'], records)
+    
     return render_template('dashboard.html', 
                          student=stats['student'],
                          analytics=analytics,
-                         attendance_records=records)
+                         attendance_records=records,
+                         fragments=fragments)
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     """Logout user"""
     session.clear()
     flash('You have been logged out successfully', 'info')
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
+
+def json_response(payload, status=200):
+    """Like jsonify, but encoded with orjson when available (see fastjson.py)"""
+    return Response(fastjson.dumps(payload), status=status, mimetype='application/json')
 
-@app.route('/api/attendance_data')
+@bp.route('/api/attendance_data')
 def api_attendance_data():
-    """API endpoint for attendance data"""
+    """API endpoint for attendance data (current term, or a past one with ?term=)"""
     if 'student_id' not in session:
         return jsonify({'error': 'Not logged in'})
     
     student_id = session['student_id']
-    stats = get_student_stats(student_id)
+    stats = get_student_stats(student_id, request.args.get('term'))
     
-    return jsonify({
+    return json_response({
         'student': stats['student'],
-        'attendance_records': stats['attendance_records']
+        'attendance_records': stats['attendance_records'],
+        'terms': get_student_terms(student_id)
     })
 
-@app.errorhandler(404)
+def require_staff_token(view):
+    """Allow a view only for requests with a valid staff API token (student sessions don't count)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        header = request.headers.get('Authorization', '')
+        token = header[len('Bearer '):] if header.startswith('Bearer ') else ''
+        if not token or not verify_staff_token(token):
+            return jsonify({'error': 'A valid staff API token is required'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def encode_cursor(key):
+    """Opaque pagination cursor for the (student_id, id) key of the last row a page covered"""
+    student_id, record_id = key
+    return base64.urlsafe_b64encode(f"{student_id}:{record_id}".encode()).decode()
+
+def decode_cursor(cursor):
+    """Turn a cursor back into the (student_id, id) key; raises ValueError if malformed"""
+    if not cursor:
+        return None
+    student_id, record_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+    return int(student_id), int(record_id)
+
+@bp.route('/api/staff/attendance')
+@require_staff_token
+def api_staff_attendance():
+    """Bulk attendance for many students, filtered by term/subject/threshold and paged by cursor"""
+    try:
+        limit = min(max(int(request.args.get('limit', 200)), 1), BULK_PAGE_MAX)
+        below = float(request.args['below']) if request.args.get('below') else None
+        after = decode_cursor(request.args.get('cursor'))
+    except (ValueError, UnicodeDecodeError):
+        return jsonify({'error': 'Invalid limit, below or cursor'}), 400
+    
+    # Archived terms are only kept per student; a bulk read of one would silently come back short
+    term = request.args.get('term')
+    if term and is_archived_term(term):
+        return jsonify({'error': f'Term {term!r} is archived; the bulk API only serves current terms'}), 400
+    
+    # One extra row tells us whether there is a next page; rows past `until` are left for the next request
+    until = bulk_scan_end(term, after, max(BULK_SCAN_ROWS, limit + 1))
+    rows = iter_bulk_attendance(term, request.args.get('subject'), below, after, limit + 1, until)
+    metrics.increment('staff_api.requests')
+    
+    def generate():
+        count = 0
+        last_row = None
+        has_more = False
+        try:
+            yield b'{"records": ['
+            for row in rows:
+                if count == limit:
+                    has_more = True
+                    break
+                yield (b',' if count else b'') + fastjson.dumps(row)
+                last_row = row
+                count += 1
+        finally:
+            rows.close()
+        metrics.increment('staff_api.records', count)
+        if has_more:
+            next_cursor = encode_cursor((last_row.student_id, last_row.id))
+        else:
+            # The scan budget ran out before the end of the table: carry on after the rows examined
+            next_cursor = encode_cursor(until) if until else None
+        yield b'], "count": %d, "next_cursor": %s}' % (count, fastjson.dumps(next_cursor))
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+@bp.route('/api/staff/search')
+@require_staff_token
+def api_staff_search():
+    """Ranked prefix search over students (roll number, name) and subjects (title, catalog)"""
+    query = request.args.get('q', '').strip()
+    kind = request.args.get('type', 'all')
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    if not query:
+        return jsonify({'error': 'Missing search query q'}), 400
+    
+    results = {}
+    if kind in ('all', 'students'):
+        results['students'] = search_students(query, limit)
+    if kind in ('all', 'subjects'):
+        results['subjects'] = search_subjects(query, limit)
+    return json_response(results)
+
+@bp.route('/api/metrics')
+def api_metrics():
+    """API endpoint for this worker's in-process counters"""
+    counters = metrics.snapshot()
+    succeeded = counters.get('scrape.succeeded', 0)
+    counters['scrape.unchanged_skip_rate'] = counters.get('scrape.unchanged_skipped', 0) / succeeded if succeeded else 0
+    counters['erp_breaker.state'] = erp_breaker.state
+    return jsonify(counters)
+
+@bp.app_errorhandler(404)
 def not_found(error):
     return render_template('error.html', 
                          error_code=404, 
                          error_message="Page not found"), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(error):
     return render_template('error.html', 
                          error_code=500, 
                          error_message="Internal server error"), 500
 
 if __name__ == '__main__':
-    # Initialize database
-    init_db()
-    
     # Run the app
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
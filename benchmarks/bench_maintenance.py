@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Request latency while database maintenance runs
+Builds a churned SQLite database (--students students whose attendance has been
+rewritten several times, leaving free pages behind), then runs request-like load:
+threads calling get_student_stats() and add_attendance_records(). Latency percentiles
+are reported with no maintenance, during db_maintenance's time-sliced backup +
+incremental vacuum + ANALYZE, and during the blocking equivalents (a one-step backup
+and a full VACUUM + ANALYZE). The database is in WAL mode, as init_db() sets it up.
+
+Usage:
+    python benchmarks/bench_maintenance.py [--students 20000] [--threads 4]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import connectdb
+import db_maintenance
+
+SUBJECTS = [('CS BCS-50%d' % n, 'Subject %d' % n) for n in range(8)]
+
+def records_for(rng):
+    return [{
+        'class_number': catalog[-3:], 'class_title': title, 'subject_catalog': catalog,
+        'academic_career': 'Undergraduate', 'institution': 'Shri Ramswaroop Memorial GPC',
+        'attendance_percentage': round(rng.uniform(40, 100), 2),
+    } for catalog, title in rng.sample(SUBJECTS, 6)]
+
+def populate(count, churn_rounds=3):
+    """Insert students and rewrite their attendance a few times, like repeated scrapes do"""
+    rng = random.Random(42)
+    conn = connectdb.get_db_connection()
+    conn.executemany('''
+        INSERT INTO students (id, roll_number, password, name, term) VALUES (?, ?, 'x', ?, 'Semester 5')
+    ''', [(n + 1, f"BE23CS{n:06d}", f"Student {n}") for n in range(count)])
+    class_ids = [connectdb.intern_class(conn, record) for record in records_for(random.Random(0)) + records_for(random.Random(1))]
+    for _ in range(churn_rounds):
+        conn.execute('DELETE FROM class_attendance')
+        conn.executemany('''
+            INSERT INTO class_attendance (student_id, class_id, attendance_percentage) VALUES (?, ?, ?)
+        ''', [(n + 1, class_id, rng.uniform(40, 100)) for n in range(count) for class_id in rng.sample(class_ids, 6)])
+        conn.commit()
+    # Leave a churned tail of free pages for the vacuum to release
+    conn.execute('DELETE FROM class_attendance WHERE student_id > ?', (count // 2,))
+    conn.commit()
+    conn.close()
+
+def load(students, stop, latencies, seed):
+    """One request thread: mostly page views, some scrape commits"""
+    rng = random.Random(seed)
+    while not stop.is_set():
+        student_id = rng.randint(1, students)
+        start = time.perf_counter()
+        if rng.random() < 0.1:
+            connectdb.add_attendance_records(student_id, records_for(rng))
+        else:
+            connectdb.get_student_stats(student_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+def sliced_maintenance(backup_dir):
+    db_maintenance.backup_database(backup_dir)
+    db_maintenance.incremental_vacuum()
+    db_maintenance.analyze()
+
+def blocking_maintenance(backup_dir):
+    source = sqlite3.connect(connectdb.backend.path, timeout=30)
+    target = sqlite3.connect(os.path.join(backup_dir, 'blocking.db'))
+    source.backup(target)
+    target.close()
+    source.execute('VACUUM')
+    source.execute('ANALYZE')
+    source.close()
+
+def run(label, students, threads, seconds, maintenance, backup_dir):
+    stop = threading.Event()
+    latencies = []
+    workers = [threading.Thread(target=load, args=(students, stop, latencies, n)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    started = time.perf_counter()
+    try:
+        if maintenance:
+            maintenance(backup_dir)
+        elapsed = time.perf_counter() - started
+        time.sleep(max(seconds - elapsed, 0))
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+    latencies.sort()
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    note = f"maintenance {elapsed:.1f} s" if maintenance else ''
+    print(f"{label:<16}{len(latencies):>10}{p50:>10.2f}{p99:>10.2f}{latencies[-1]:>10.1f}  {note}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark request latency during database maintenance')
+    parser.add_argument('--students', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        connectdb.use_backend(os.path.join(tmp, 'bench.db'))
+        connectdb.init_db()
+        populate(args.students)
+        size = os.path.getsize(connectdb.backend.path) / 1024 / 1024
+        print(f"{args.students} students, database {size:.1f} MB")
+
+        print(f"{'':<16}{'requests':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        run('no maintenance', args.students, args.threads, args.seconds, None, tmp)
+        run('time-sliced', args.students, args.threads, args.seconds, sliced_maintenance, tmp)
+        # The time-sliced pass released the free pages; churn again so VACUUM has work too
+        conn = connectdb.get_db_connection()
+        conn.execute('DELETE FROM class_attendance WHERE student_id > ?', (args.students // 4,))
+        conn.commit()
+        conn.close()
+        run('blocking', args.students, args.threads, args.seconds, blocking_maintenance, tmp)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Database size and query time before and after normalizing attendance_records
+Builds a cohort in the original denormalized layout, measures it, migrates it with
+init_db() (subjects/classes dimension tables + attendance_records view) and measures
+again. The get_student_stats() queries (as they were before records were tagged by term)
+and the cohort query run unchanged against both layouts. The stats call opens its own
+connection, so it also pays for parsing the schema; the "records query only" row times
+the same SELECT on an already open connection.
+
+Usage:
+    python benchmarks/bench_normalization.py [--students 20000] [--repeat 200]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import connectdb
+
+SUBJECTS = [
+    ('1611', 'CS BCS-052', 'Data Analytics'),
+    ('1612', 'CS BCS-055', 'Machine Learning Techniques'),
+    ('1613', 'CS BCS-058', 'Data Warehousing & Data Mining'),
+    ('1497', 'CS BCS-501', 'Database Management System'),
+    ('1498', 'CS BCS-502', 'Web Technology'),
+    ('1499', 'CS BCS-503', 'Design and Analysis of Algorithm'),
+    ('1500', 'CS BCS-551', 'DATABASE MANAGEMENT SYSTEM LAB'),
+    ('1501', 'CS BCS-552', 'WEB TECHNOLOGY LAB'),
+]
+
+# The attendance_records table as it was before schema version 7
+LEGACY_SCHEMA = '''
+    CREATE TABLE students (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        roll_number TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        name TEXT, institution TEXT, academic_career TEXT, term TEXT,
+        total_attendance_percent REAL, medical_attendance_percent REAL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, last_login TIMESTAMP
+    );
+    CREATE TABLE attendance_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER,
+        class_number TEXT, class_title TEXT, subject_catalog TEXT,
+        academic_career TEXT, institution TEXT,
+        attendance_percentage REAL,
+        scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (student_id) REFERENCES students (id)
+    );
+    CREATE INDEX idx_attendance_student ON attendance_records (student_id, id);
+    CREATE TABLE login_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER,
+        login_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        ip_address TEXT, user_agent TEXT
+    );
+'''
+
+def build_legacy(path, count):
+    """Create a legacy-layout database with `count` students and 8 records each"""
+    random.seed(7)
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany('INSERT INTO students (id, roll_number, password, name, term) VALUES (?, ?, ?, ?, ?)',
+                     [(n, f'BE23CS{n:06d}', 'x', f'Student {n}', 'Semester 5') for n in range(1, count + 1)])
+    conn.executemany('''
+        INSERT INTO attendance_records
+        (student_id, class_number, class_title, subject_catalog, academic_career, institution, attendance_percentage)
+        VALUES (?, ?, ?, ?, 'Undergraduate', 'Shri Ramswaroop Memorial GPC', ?)
+    ''', [(n, number, title, catalog, round(random.uniform(40, 100), 2))
+          for n in range(1, count + 1) for number, catalog, title in SUBJECTS])
+    conn.commit()
+    conn.close()
+
+def student_stats(student_id):
+    """get_student_stats() as of schema version 7: student, all attendance records, login history"""
+    conn = connectdb.get_db_connection()
+    conn.execute('SELECT * FROM students WHERE id = ?', (student_id,)).fetchone()
+    conn.execute('''
+        SELECT * FROM attendance_records WHERE student_id = ? ORDER BY attendance_percentage DESC
+    ''', (student_id,)).fetchall()
+    conn.execute('''
+        SELECT login_time FROM login_logs WHERE student_id = ? ORDER BY login_time DESC LIMIT 10
+    ''', (student_id,)).fetchall()
+    conn.close()
+
+def measure(path, students, repeat):
+    """Get file size (after VACUUM) and query timings for the database at `path`"""
+    conn = sqlite3.connect(path)
+    conn.execute('VACUUM')
+    conn.close()
+    size = os.path.getsize(path)
+
+    random.seed(11)
+    stats_ms = []
+    for _ in range(repeat):
+        student_id = random.randint(1, students)
+        start = time.perf_counter()
+        student_stats(student_id)
+        stats_ms.append((time.perf_counter() - start) * 1000)
+
+    conn = connectdb.get_db_connection()
+    query_ms = []
+    for _ in range(repeat):
+        student_id = random.randint(1, students)
+        start = time.perf_counter()
+        conn.execute('''
+            SELECT * FROM attendance_records WHERE student_id = ? ORDER BY attendance_percentage DESC
+        ''', (student_id,)).fetchall()
+        query_ms.append((time.perf_counter() - start) * 1000)
+
+    cohort_ms = []
+    for _ in range(max(repeat // 20, 3)):
+        start = time.perf_counter()
+        conn.execute('SELECT * FROM attendance_records WHERE subject_catalog = ?', ('CS BCS-501',)).fetchall()
+        cohort_ms.append((time.perf_counter() - start) * 1000)
+    conn.close()
+    return size, statistics.median(stats_ms), statistics.median(query_ms), statistics.median(cohort_ms)
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the attendance_records normalization')
+    parser.add_argument('--students', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cohort.db')
+        build_legacy(path, args.students)
+        connectdb.use_backend(path)
+        before = measure(path, args.students, args.repeat)
+
+        start = time.perf_counter()
+        connectdb.init_db()
+        migration_seconds = time.perf_counter() - start
+        after = measure(path, args.students, args.repeat)
+
+    print(f"{args.students} students x {len(SUBJECTS)} records, migration took {migration_seconds:.1f} s")
+    print(f"{'':<28}{'before':>12}{'after':>12}")
+    print(f"{'database size (MiB)':<28}{before[0] / 2**20:>12.2f}{after[0] / 2**20:>12.2f}")
+    print(f"{'get_student_stats (ms)':<28}{before[1]:>12.3f}{after[1]:>12.3f}")
+    print(f"{'  records query only (ms)':<28}{before[2]:>12.3f}{after[2]:>12.3f}")
+    print(f"{'cohort subject query (ms)':<28}{before[3]:>12.2f}{after[3]:>12.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Hot table size and query time with past terms kept hot vs archived
+Populates --students students with --terms terms of attendance each (the last one
+current), all in class_attendance, and measures the current-term get_student_stats(),
+the staff bulk query for the current term and the size of class_attendance. Then
+archive_past_terms() moves the past terms to attendance_archive and the same is
+measured again, plus a historical lookup through get_term_attendance().
+
+Usage:
+    python benchmarks/bench_partitioning.py [--students 20000] [--terms 6] [--repeat 200]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import connectdb
+
+SUBJECTS = [('CS BCS-%d0%d' % (semester, n), 'Semester %d subject %d' % (semester, n))
+            for semester in range(1, 9) for n in range(8)]
+
+def term_name(n):
+    return f"Semester {n} year 25{n:02d} UG/PG"
+
+def populate(count, terms):
+    """Insert `count` students with 8 records in each of `terms` terms"""
+    random.seed(42)
+    conn = connectdb.get_db_connection()
+    current = term_name(terms)
+    conn.executemany('''
+        INSERT INTO students (id, roll_number, password, name, term) VALUES (?, ?, 'x', ?, ?)
+    ''', [(n + 1, f"BE23CS{n:06d}", f"Student {n}", current) for n in range(count)])
+    class_ids = {
+        subject: connectdb.intern_class(conn, {
+            'class_number': subject[0][-3:], 'class_title': subject[1], 'subject_catalog': subject[0],
+            'academic_career': 'Undergraduate', 'institution': 'Shri Ramswaroop Memorial GPC',
+        })
+        for subject in SUBJECTS
+    }
+    for semester in range(1, terms + 1):
+        subjects = [subject for subject in SUBJECTS if subject[0].startswith(f'CS BCS-{semester}')]
+        conn.executemany('''
+            INSERT INTO class_attendance (student_id, class_id, attendance_percentage, term) VALUES (?, ?, ?, ?)
+        ''', [(n + 1, class_ids[subject], round(random.uniform(40, 100), 2), term_name(semester))
+              for n in range(count) for subject in subjects])
+    conn.commit()
+    conn.close()
+    return current
+
+def table_pages(table):
+    conn = connectdb.get_db_connection()
+    pages = conn.execute("SELECT COUNT(*) FROM dbstat WHERE name = ?", (table,)).fetchone()[0]
+    rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    conn.close()
+    return rows, pages
+
+def time_ms(function, students, repeat):
+    random.seed(11)
+    timings = []
+    for _ in range(repeat):
+        student_id = random.randint(1, students)
+        start = time.perf_counter()
+        function(student_id)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def measure(students, current, repeat):
+    rows, pages = table_pages('class_attendance')
+    stats_ms = time_ms(connectdb.get_student_stats, students, repeat)
+    start = time.perf_counter()
+    bulk = sum(1 for _ in connectdb.iter_bulk_attendance(term=current, limit=1000))
+    bulk_ms = (time.perf_counter() - start) * 1000
+    return rows, pages, stats_ms, bulk_ms, bulk
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark term archival')
+    parser.add_argument('--students', type=int, default=20000)
+    parser.add_argument('--terms', type=int, default=6)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        connectdb.use_backend(os.path.join(tmp, 'bench.db'))
+        connectdb.init_db()
+        current = populate(args.students, args.terms)
+        hot = measure(args.students, current, args.repeat)
+
+        start = time.perf_counter()
+        archived = connectdb.archive_past_terms()
+        archive_seconds = time.perf_counter() - start
+        cold = measure(args.students, current, args.repeat)
+        archive_rows, archive_pages = table_pages('attendance_archive')
+        history_ms = time_ms(lambda student_id: connectdb.get_term_attendance(student_id, term_name(1)),
+                             args.students, args.repeat)
+
+    print(f"{args.students} students x {args.terms} terms; archived {archived} records in {archive_seconds:.1f} s")
+    print(f"{'':<34}{'all hot':>12}{'archived':>12}")
+    print(f"{'class_attendance rows':<34}{hot[0]:>12,}{cold[0]:>12,}")
+    print(f"{'class_attendance pages':<34}{hot[1]:>12,}{cold[1]:>12,}")
+    print(f"{'get_student_stats (ms)':<34}{hot[2]:>12.3f}{cold[2]:>12.3f}")
+    print(f"{'bulk current term, 1000 rows (ms)':<34}{hot[3]:>12.2f}{cold[3]:>12.2f}")
+    print(f"attendance_archive: {archive_rows:,} rows in {archive_pages:,} pages; "
+          f"historical get_term_attendance {history_ms:.3f} ms")
+
+if __name__ == "__main__":
+    main()
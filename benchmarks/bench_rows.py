@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Row representation and JSON encoding on large result sets
+Fetches the same cohort-wide attendance query (students joined with their records)
+three ways and reports build time, live allocations and retained memory of the
+materialized rows, then serialization time and output size:
+
+    dict rows    sqlite3.Row -> dict, encoded with json.dumps(default=str) (the old path)
+    slots rows   rows.BulkAttendanceRow, encoded with fastjson (orjson if installed)
+    slots/json   the same rows through fastjson's stdlib fallback
+
+Usage:
+    python benchmarks/bench_rows.py [--students 20000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import connectdb
+import fastjson
+from rows import BulkAttendanceRow
+
+SUBJECTS = [
+    ('CS BCS-052', 'Data Analytics'),
+    ('CS BCS-055', 'Machine Learning Techniques'),
+    ('CS BCS-058', 'Data Warehousing & Data Mining'),
+    ('CS BCS-501', 'Database Management System'),
+    ('CS BCS-502', 'Web Technology'),
+    ('CS BCS-503', 'Design and Analysis of Algorithm'),
+    ('CS BCS-551', 'DATABASE MANAGEMENT SYSTEM LAB'),
+    ('CS BCS-552', 'WEB TECHNOLOGY LAB'),
+]
+
+COHORT_QUERY = '''
+    SELECT ar.student_id, ar.id, s.roll_number, s.name, s.term,
+           ar.class_number, ar.class_title, ar.subject_catalog, ar.attendance_percentage, ar.scraped_at
+    FROM attendance_records ar
+    JOIN students s ON s.id = ar.student_id
+    ORDER BY ar.student_id, ar.id
+'''
+
+def populate(count):
+    """Insert `count` students with 6 attendance records each"""
+    random.seed(42)
+    conn = connectdb.get_db_connection()
+    conn.executemany('''
+        INSERT INTO students (id, roll_number, password, name, term) VALUES (?, ?, 'x', ?, 'Semester 5')
+    ''', [(n + 1, f"BE23CS{n:06d}", f"Student {n}") for n in range(count)])
+    class_ids = [
+        connectdb.intern_class(conn, {
+            'class_number': subject_catalog[-3:], 'class_title': class_title, 'subject_catalog': subject_catalog,
+            'academic_career': 'Undergraduate', 'institution': 'Shri Ramswaroop Memorial GPC',
+        })
+        for subject_catalog, class_title in SUBJECTS
+    ]
+    conn.executemany('''
+        INSERT INTO class_attendance (student_id, class_id, attendance_percentage) VALUES (?, ?, ?)
+    ''', [(n + 1, class_id, round(random.uniform(40, 100), 2))
+          for n in range(count) for class_id in random.sample(class_ids, 6)])
+    conn.commit()
+    conn.close()
+
+def dict_rows(conn):
+    return [dict(row) for row in conn.execute(COHORT_QUERY)]
+
+def slots_rows(conn):
+    return [BulkAttendanceRow(*row) for row in conn.execute(COHORT_QUERY)]
+
+def encode_stdlib(rows):
+    return json.dumps(rows, default=str).encode()
+
+def encode_fallback(rows):
+    orjson, fastjson.orjson = fastjson.orjson, None
+    try:
+        return fastjson.dumps(rows)
+    finally:
+        fastjson.orjson = orjson
+
+def measure_build(build, conn, repeat):
+    """(median build ms, live blocks, retained MB) for one materialized result set"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build(conn)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    rows = build(conn)
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = snapshot.statistics('filename')
+    blocks = sum(stat.count for stat in stats)
+    retained = sum(stat.size for stat in stats)
+    return statistics.median(timings), blocks, retained / 1024 / 1024, rows
+
+def measure_encode(encode, rows, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = encode(rows)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), len(body)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark compact rows and fast JSON encoding')
+    parser.add_argument('--students', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        connectdb.use_backend(os.path.join(tmp, 'bench.db'))
+        connectdb.init_db()
+        populate(args.students)
+        conn = connectdb.get_db_connection()
+
+        print(f"{args.students * 6} rows, JSON encoder: {fastjson.BACKEND}")
+        print(f"{'':<12}{'build ms':>10}{'live blocks':>14}{'retained MB':>13}{'encode ms':>11}{'bytes':>12}")
+        for label, build, encode in (('dict rows', dict_rows, encode_stdlib),
+                                     ('slots rows', slots_rows, fastjson.dumps),
+                                     ('slots/json', slots_rows, encode_fallback)):
+            build_ms, blocks, retained, rows = measure_build(build, conn, args.repeat)
+            encode_ms, size = measure_encode(encode, rows, args.repeat)
+            print(f"{label:<12}{build_ms:>10.1f}{blocks:>14,}{retained:>13.1f}{encode_ms:>11.1f}{size:>12,}")
+            del rows
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Compare the "legacy" and "lean" Chrome scrape profiles
+For each profile this loads the ERP login page (and, when ERP_BENCH_ROLL and
+ERP_BENCH_PASSWORD are set, logs in and opens the attendance page) and reports:
+  - bytes transferred, from the DevTools Network.loadingFinished events
+  - page-load time
+  - peak RSS of chromedriver and all Chrome processes (needs psutil)
+
+Usage:
+    python benchmarks/bench_scrape_profiles.py [--runs 3]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapp import LOGIN_URL, ATTENDANCE_URL, build_chrome_options, apply_resource_blocking
+
+class PeakRSS:
+    """Samples the RSS of a process tree in a background thread"""
+
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        import psutil
+        root = psutil.Process(self.pid)
+        while not self._stop.is_set():
+            total = 0
+            try:
+                for process in [root] + root.children(recursive=True):
+                    total += process.memory_info().rss
+            except psutil.Error:
+                pass
+            self.peak = max(self.peak, total)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def bytes_transferred(driver):
+    """Sum encoded bytes of every finished network request in the performance log"""
+    total = 0
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        if message["method"] == "Network.loadingFinished":
+            total += message["params"].get("encodedDataLength", 0)
+    return total
+
+def load_pages(driver):
+    """Open the pages a scrape visits and return the elapsed seconds"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    wait = WebDriverWait(driver, 30)
+    start = time.perf_counter()
+    driver.get(LOGIN_URL)
+    wait.until(EC.presence_of_element_located((By.ID, "userid")))
+
+    roll_number = os.environ.get("ERP_BENCH_ROLL")
+    password = os.environ.get("ERP_BENCH_PASSWORD")
+    if roll_number and password:
+        driver.find_element(By.ID, "userid").send_keys(roll_number)
+        driver.find_element(By.ID, "pwd").send_keys(password)
+        driver.find_element(By.NAME, "Submit").click()
+        wait.until(EC.presence_of_element_located((By.ID, "pthnavcontainer")))
+        driver.get(ATTENDANCE_URL)
+        wait.until(EC.frame_to_be_available_and_switch_to_it("ptifrmtgtframe"))
+        wait.until(EC.element_to_be_clickable((By.ID, "RESULT3$0"))).click()
+        wait.until(EC.presence_of_element_located((By.XPATH, "//table[contains(@id,'STDNT_ENRL')]")))
+    return time.perf_counter() - start
+
+def run_profile(profile):
+    """Run one scrape-like page load with a profile and collect its measurements"""
+    from selenium import webdriver
+
+    options = build_chrome_options(profile)
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    driver = webdriver.Chrome(options=options)
+    try:
+        apply_resource_blocking(driver, profile)
+        try:
+            with PeakRSS(driver.service.process.pid) as rss:
+                elapsed = load_pages(driver)
+            peak_rss = rss.peak
+        except ImportError:
+            elapsed = load_pages(driver)
+            peak_rss = None
+        return elapsed, bytes_transferred(driver), peak_rss
+    finally:
+        driver.quit()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Chrome scrape profiles")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    for profile in ("legacy", "lean"):
+        results = [run_profile(profile) for _ in range(args.runs)]
+        elapsed = statistics.median(r[0] for r in results)
+        transferred = statistics.median(r[1] for r in results)
+        rss_values = [r[2] for r in results if r[2] is not None]
+        rss = f"{statistics.median(rss_values) / 2**20:.0f} MiB" if rss_values else "n/a (install psutil)"
+        print(f"{profile:>7}: load {elapsed:.2f} s, transferred {transferred / 1024:.0f} KiB, peak RSS {rss}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Search benchmark: FTS5 index vs LIKE scans
+Builds a throwaway SQLite database with --students synthetic students (default
+100k) and a realistic subject mix, then times search_students/search_subjects
+against the equivalent LIKE '%...%' queries. Both return ordered results (FTS5 by
+bm25 rank, LIKE by roll number), so neither can stop at the first 20 matches.
+
+Usage:
+    python benchmarks/bench_search.py [--students 100000] [--repeat 50]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import connectdb
+
+FIRST_NAMES = ['Aarav', 'Aditi', 'Ananya', 'Arjun', 'Ayush', 'Divya', 'Ishaan', 'Kavya', 'Meera',
+               'Nikhil', 'Priya', 'Rahul', 'Riya', 'Rohan', 'Sakshi', 'Shreya', 'Vivek', 'Yash']
+LAST_NAMES = ['Agarwal', 'Chauhan', 'Dubey', 'Gupta', 'Jain', 'Mishra', 'Pandey', 'Rastogi',
+              'Sharma', 'Singh', 'Srivastava', 'Tiwari', 'Verma', 'Yadav']
+SUBJECTS = [
+    ('CS BCS-052', 'Data Analytics'),
+    ('CS BCS-055', 'Machine Learning Techniques'),
+    ('CS BCS-058', 'Data Warehousing & Data Mining'),
+    ('CS BCS-501', 'Database Management System'),
+    ('CS BCS-502', 'Web Technology'),
+    ('CS BCS-503', 'Design and Analysis of Algorithm'),
+    ('CS BCS-551', 'DATABASE MANAGEMENT SYSTEM LAB'),
+    ('CS BCS-552', 'WEB TECHNOLOGY LAB'),
+]
+DEPARTMENTS = ['CS', 'IT', 'EC', 'ME', 'EE', 'CE']
+
+QUERIES = {
+    'students': ['BE23CS0', 'BE22IT1', 'Dubey', 'Priya Sh', 'ayu'],
+    'subjects': ['BCS-501', 'Database', 'web tech', 'Machine'],
+}
+
+def populate(count):
+    """Insert `count` students with 6 attendance records each, then build the search index"""
+    random.seed(42)
+    students = []
+    records = []
+    for n in range(count):
+        roll_number = f"BE{random.choice(['21', '22', '23', '24'])}{random.choice(DEPARTMENTS)}{n:06d}"
+        name = f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}"
+        students.append((n + 1, roll_number, name))
+        for subject in random.sample(SUBJECTS, 6):
+            records.append((n + 1, subject, round(random.uniform(40, 100), 2)))
+
+    conn = connectdb.get_db_connection()
+    conn.executemany('''
+        INSERT INTO students (id, roll_number, password, name, term) VALUES (?, ?, 'x', ?, 'Semester 5')
+    ''', students)
+    class_ids = {
+        (subject_catalog, class_title): connectdb.intern_class(conn, {
+            'class_number': subject_catalog[-3:], 'class_title': class_title, 'subject_catalog': subject_catalog,
+            'academic_career': 'Undergraduate', 'institution': 'Shri Ramswaroop Memorial GPC',
+        })
+        for subject_catalog, class_title in SUBJECTS
+    }
+    conn.executemany('''
+        INSERT INTO class_attendance (student_id, class_id, attendance_percentage) VALUES (?, ?, ?)
+    ''', [(student_id, class_ids[subject], percentage) for student_id, subject, percentage in records])
+    connectdb.rebuild_search_index(conn)
+    conn.commit()
+    conn.close()
+
+def like_students(text, limit=20):
+    conn = connectdb.get_db_connection()
+    pattern = '%' + text.lower() + '%'
+    rows = conn.execute('''
+        SELECT id, roll_number, name FROM students
+        WHERE LOWER(roll_number) LIKE ? OR LOWER(name) LIKE ?
+        ORDER BY roll_number LIMIT ?
+    ''', (pattern, pattern, limit)).fetchall()
+    conn.close()
+    return rows
+
+def like_subjects(text, limit=20):
+    conn = connectdb.get_db_connection()
+    pattern = '%' + text.lower() + '%'
+    rows = conn.execute('''
+        SELECT DISTINCT subject_catalog, class_title FROM attendance_records
+        WHERE LOWER(subject_catalog) LIKE ? OR LOWER(class_title) LIKE ? LIMIT ?
+    ''', (pattern, pattern, limit)).fetchall()
+    conn.close()
+    return rows
+
+def time_ms(function, query, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark FTS5 search against LIKE scans')
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        connectdb.use_backend(os.path.join(tmp, 'bench.db'))
+        connectdb.init_db()
+        start = time.perf_counter()
+        populate(args.students)
+        print(f"Populated {args.students} students in {time.perf_counter() - start:.1f} s")
+
+        print(f"{'query':<22}{'FTS5 median/p95 ms':>22}{'LIKE median/p95 ms':>22}")
+        for kind, fts, like in (('students', connectdb.search_students, like_students),
+                                ('subjects', connectdb.search_subjects, like_subjects)):
+            for query in QUERIES[kind]:
+                fts_median, fts_p95 = time_ms(fts, query, args.repeat)
+                like_median, like_p95 = time_ms(like, query, max(args.repeat // 10, 3))
+                print(f"{kind + ': ' + query:<22}{fts_median:>13.2f} / {fts_p95:<7.2f}{like_median:>13.2f} / {like_p95:<7.2f}")
+
+if __name__ == "__main__":
+    main()
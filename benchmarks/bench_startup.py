@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the Flask app
+Measures how long a fresh interpreter takes to import app.py and build the app,
+and whether Selenium/BeautifulSoup were pulled in along the way.
+
+Usage:
+    python benchmarks/bench_startup.py                 # measure this tree
+    python benchmarks/bench_startup.py --tree ../old   # measure another checkout (e.g. the baseline)
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter; prints elapsed seconds and heavy modules loaded
+PROBE = '''
+import sys, time
+start = time.perf_counter()
+import app
+if hasattr(app, 'create_app'):
+    app.create_app()
+elapsed = time.perf_counter() - start
+heavy = sorted(m for m in ('selenium', 'bs4') if m in sys.modules)
+print(elapsed, ','.join(heavy) or '-')
+'''
+
+def measure(tree, runs):
+    """Start `runs` fresh interpreters in `tree` and collect their startup times"""
+    timings = []
+    heavy = '-'
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, ERP_DB_PATH=os.path.join(tmp, 'bench.db'))
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, '-c', PROBE], cwd=tree, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            elapsed, heavy = output.strip().splitlines()[-1].split()
+            timings.append(float(elapsed) * 1000)
+    return timings, heavy
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure app.py cold-start time')
+    parser.add_argument('--tree', default=ROOT, help='checkout to measure (default: this one)')
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    timings, heavy = measure(os.path.abspath(args.tree), args.runs)
+    print(f"Tree: {os.path.abspath(args.tree)}")
+    print(f"Runs: {args.runs}")
+    print(f"Import + create_app: median {statistics.median(timings):.1f} ms, "
+          f"min {min(timings):.1f} ms, max {max(timings):.1f} ms")
+    print(f"Heavy modules loaded at startup: {heavy}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Circuit breaker for the ERP scraping layer
+When campus.srmcem.ac.in is slow or down every scrape waits out its timeouts, so
+browsers and threads pile up. The breaker watches the outcome and latency of recent
+scrapes and, once too many fail or run slow, opens: scrapes are refused immediately
+and stored data is served instead. After a cooldown a single half-open probe is let
+through, and its result decides whether the breaker closes again. A probe that never
+reports back (its process died) gives up its slot after probe_timeout_seconds.
+"""
+
+import threading
+import time
+from collections import deque
+
+import metrics
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    """Failure-rate and slow-call-rate breaker over a sliding time window"""
+
+    def __init__(self, name, window_seconds=300, min_calls=5, failure_rate=0.5,
+                 slow_call_seconds=45, slow_call_rate=0.8, cooldown_seconds=120, probe_timeout_seconds=300):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.cooldown_seconds = cooldown_seconds
+        self.probe_timeout_seconds = probe_timeout_seconds
+        self._calls = deque()  # (finished_at, succeeded, latency)
+        self._state = CLOSED
+        self._opened_at = 0
+        self._probe_in_flight = False
+        self._probe_started_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def allow_request(self):
+        """Check whether a scrape may start; in half-open state only one probe is let through"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._probe_started_at = time.monotonic()
+                return True
+        metrics.increment(f'{self.name}_breaker.rejected')
+        return False
+
+    def record_success(self, latency):
+        """Record a finished scrape that returned data"""
+        self._record(True, latency)
+
+    def record_failure(self, latency):
+        """Record a scrape that failed or returned nothing"""
+        self._record(False, latency)
+
+    def _record(self, succeeded, latency):
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state()
+            if state == HALF_OPEN:
+                self._probe_in_flight = False
+                if succeeded and latency < self.slow_call_seconds:
+                    self._close()
+                else:
+                    self._open(now)
+                return
+
+            self._calls.append((now, succeeded, latency))
+            while self._calls and self._calls[0][0] < now - self.window_seconds:
+                self._calls.popleft()
+            if state == CLOSED and len(self._calls) >= self.min_calls:
+                failures = sum(1 for _, ok, _ in self._calls if not ok)
+                slow = sum(1 for _, _, elapsed in self._calls if elapsed >= self.slow_call_seconds)
+                if (failures / len(self._calls) >= self.failure_rate
+                        or slow / len(self._calls) >= self.slow_call_rate):
+                    self._open(now)
+
+    def _current_state(self):
+        now = time.monotonic()
+        if self._state == OPEN and now - self._opened_at >= self.cooldown_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        elif (self._state == HALF_OPEN and self._probe_in_flight
+              and now - self._probe_started_at >= self.probe_timeout_seconds):
+            # The probe's outcome was never recorded; let the next scrape probe instead
+            self._probe_in_flight = False
+            metrics.increment(f'{self.name}_breaker.probe_lost')
+        return self._state
+
+    def _open(self, now):
+        self._state = OPEN
+        self._opened_at = now
+        self._calls.clear()
+        metrics.increment(f'{self.name}_breaker.opened')
+        print(f"Circuit breaker '{self.name}' opened")
+
+    def _close(self):
+        self._state = CLOSED
+        self._calls.clear()
+        metrics.increment(f'{self.name}_breaker.closed')
+        print(f"Circuit breaker '{self.name}' closed")
+
+# Shared by every scrape started from this process
+erp_breaker = CircuitBreaker('erp')
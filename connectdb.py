@@ -1,76 +1,373 @@
-import sqlite3
 import os
+import re
+import hashlib
+import json
+import secrets
+import time
+import zlib
 from datetime import datetime
 
+from db_backends import create_backend
+from rows import AttendanceRecord, LoginEntry, BulkAttendanceRow, column_list
+
+DB_PATH = os.environ.get('ERP_DB_PATH', 'student_erp.db')
+
+# A postgresql:// URL here selects the pooled PostgreSQL backend instead of SQLite
+DB_URL = os.environ.get('ERP_DB_URL', '')
+
+# PostgreSQL pool: connections per process, and how long a caller waits for a free one
+DB_POOL_SIZE = int(os.environ.get('ERP_DB_POOL_SIZE', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('ERP_DB_POOL_TIMEOUT', 30))
+
+# Bumped whenever init_db() changes the schema; stored by the backend (PRAGMA user_version on SQLite)
+SCHEMA_VERSION = 13
+
+# Subjects below this percentage count as low attendance on the dashboard
+LOW_ATTENDANCE_THRESHOLD = 75
+
+_schema_checked = False
+_search_index = None
+
+backend = create_backend(DB_URL or DB_PATH, DB_POOL_SIZE, DB_POOL_TIMEOUT)
+IntegrityError = backend.IntegrityError
+
+def use_backend(url):
+    """Switch storage backend, e.g. to run the tests or benchmarks against another database"""
+    global backend, IntegrityError, _schema_checked, _search_index
+    backend.close()
+    backend = create_backend(url, DB_POOL_SIZE, DB_POOL_TIMEOUT)
+    IntegrityError = backend.IntegrityError
+    _schema_checked = False
+    _search_index = None
+    return backend
+
 def get_db_connection():
     """Get database connection"""
-    conn = sqlite3.connect('student_erp.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    return backend.connect()
+
+def add_column_if_missing(conn, table, column, definition):
+    """Add a column to an existing table unless it is already there"""
+    if column not in backend.column_names(conn, table):
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
 
 def init_db():
     """Initialize database with required tables"""
     conn = get_db_connection()
-    
-    # Create students table
+    try:
+        if backend.name == 'sqlite':
+            # Only takes effect on a new, empty database; lets db_maintenance.py vacuum incrementally
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            # Readers and writers stop blocking each other, and online backups can read a stable snapshot
+            conn.execute('PRAGMA journal_mode = WAL')
+        
+        # Create students table
+        conn.execute(backend.translate_ddl('''
+            CREATE TABLE IF NOT EXISTS students (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                roll_number TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL,
+                name TEXT,
+                institution TEXT,
+                academic_career TEXT,
+                term TEXT,
+                total_attendance_percent REAL,
+                medical_attendance_percent REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_login TIMESTAMP,
+                data_version INTEGER NOT NULL DEFAULT 0,
+                page_fingerprint TEXT,
+                last_scraped_at TIMESTAMP,
+                scrape_started_at TIMESTAMP
+            )
+        '''))
+        
+        # Columns added after the first release; CREATE TABLE IF NOT EXISTS leaves old tables as they are
+        add_column_if_missing(conn, 'students', 'data_version', 'INTEGER NOT NULL DEFAULT 0')
+        add_column_if_missing(conn, 'students', 'page_fingerprint', 'TEXT')
+        add_column_if_missing(conn, 'students', 'last_scraped_at', 'TIMESTAMP')
+        add_column_if_missing(conn, 'students', 'scrape_started_at', 'TIMESTAMP')
+        
+        # Subjects and classes are interned into dimension tables; class_attendance only holds ids
+        # and the percentage, and the attendance_records view joins them back into the original row shape
+        conn.execute(backend.translate_ddl('''
+            CREATE TABLE IF NOT EXISTS subjects (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                subject_catalog TEXT NOT NULL,
+                class_title TEXT NOT NULL,
+                UNIQUE (subject_catalog, class_title)
+            )
+        '''))
+        
+        conn.execute(backend.translate_ddl('''
+            CREATE TABLE IF NOT EXISTS classes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                class_number TEXT NOT NULL,
+                subject_id INTEGER NOT NULL,
+                academic_career TEXT NOT NULL,
+                institution TEXT NOT NULL,
+                UNIQUE (class_number, subject_id, academic_career, institution),
+                FOREIGN KEY (subject_id) REFERENCES subjects (id)
+            )
+        '''))
+        
+        conn.execute(backend.translate_ddl('''
+            CREATE TABLE IF NOT EXISTS class_attendance (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_id INTEGER,
+                class_id INTEGER NOT NULL,
+                attendance_percentage REAL,
+                scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                term TEXT NOT NULL DEFAULT '',
+                FOREIGN KEY (student_id) REFERENCES students (id),
+                FOREIGN KEY (class_id) REFERENCES classes (id)
+            )
+        '''))
+        add_column_if_missing(conn, 'class_attendance', 'term', "TEXT NOT NULL DEFAULT ''")
+        
+        # Databases created before schema version 7 have a denormalized attendance_records table
+        if backend.table_type(conn, 'attendance_records') == 'table':
+            migrate_attendance_records(conn)
+        # The migration keeps the old ids; on PostgreSQL that leaves the SERIAL sequence behind them
+        # (also repairs databases migrated before this was done)
+        backend.sync_id_sequence(conn, 'class_attendance')
+        
+        # Records from before schema version 10 belong to the term their student is in
+        conn.execute('''
+            UPDATE class_attendance
+            SET term = (SELECT s.term FROM students s WHERE s.id = class_attendance.student_id)
+            WHERE term = '' AND EXISTS (
+                SELECT 1 FROM students s WHERE s.id = class_attendance.student_id AND s.term <> ''
+            )
+        ''')
+        
+        # Past terms live in attendance_archive, one compressed row per student and term
+        conn.execute(backend.translate_ddl('''
+            CREATE TABLE IF NOT EXISTS attendance_archive (
+                student_id INTEGER NOT NULL,
+                term TEXT NOT NULL,
+                record_count INTEGER NOT NULL,
+                records BLOB NOT NULL,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (student_id, term),
+                FOREIGN KEY (student_id) REFERENCES students (id)
+            )
+        '''))
+        
+        if (backend.table_type(conn, 'attendance_records') == 'view'
+                and 'term' not in backend.column_names(conn, 'attendance_records')):
+            conn.execute('DROP VIEW attendance_records')
+        
+        if backend.table_type(conn, 'attendance_records') is None:
+            conn.execute('''
+                CREATE VIEW attendance_records AS
+                SELECT ca.id, ca.student_id, c.class_number, s.class_title, s.subject_catalog,
+                       c.academic_career, c.institution, ca.attendance_percentage, ca.scraped_at, ca.term
+                FROM class_attendance ca
+                JOIN classes c ON c.id = ca.class_id
+                JOIN subjects s ON s.id = c.subject_id
+            ''')
+        
+        # Create login_logs table
+        conn.execute(backend.translate_ddl('''
+            CREATE TABLE IF NOT EXISTS login_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_id INTEGER,
+                login_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                ip_address TEXT,
+                user_agent TEXT,
+                FOREIGN KEY (student_id) REFERENCES students (id)
+            )
+        '''))
+        
+        # Create refresh_credentials table (only students who opted in to background refresh)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS refresh_credentials (
+                student_id INTEGER PRIMARY KEY,
+                encrypted_password TEXT NOT NULL,
+                opted_in_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_attempt_at TIMESTAMP,
+                consecutive_failures INTEGER NOT NULL DEFAULT 0,
+                FOREIGN KEY (student_id) REFERENCES students (id)
+            )
+        ''')
+        add_column_if_missing(conn, 'refresh_credentials', 'last_attempt_at', 'TIMESTAMP')
+        add_column_if_missing(conn, 'refresh_credentials', 'consecutive_failures', 'INTEGER NOT NULL DEFAULT 0')
+        
+        # Create staff_api_tokens table (bulk API access, separate from student sessions)
+        conn.execute(backend.translate_ddl('''
+            CREATE TABLE IF NOT EXISTS staff_api_tokens (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                token_hash TEXT UNIQUE NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                revoked INTEGER NOT NULL DEFAULT 0
+            )
+        '''))
+        
+        # Create scrape_jobs table (durable queue claimed by scrape_worker.py processes under a lease)
+        conn.execute(backend.translate_ddl('''
+            CREATE TABLE IF NOT EXISTS scrape_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_id INTEGER NOT NULL,
+                roll_number TEXT NOT NULL,
+                encrypted_password TEXT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                available_at DOUBLE PRECISION NOT NULL,
+                lease_owner TEXT,
+                lease_expires_at DOUBLE PRECISION,
+                enqueued_at DOUBLE PRECISION NOT NULL,
+                finished_at DOUBLE PRECISION,
+                error TEXT,
+                FOREIGN KEY (student_id) REFERENCES students (id)
+            )
+        '''))
+        
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_scrape_jobs_claim ON scrape_jobs (status, available_at, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_scrape_jobs_student ON scrape_jobs (student_id, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_login_logs_student ON login_logs (student_id, login_time)')
+        # Keyset pagination and filters of the staff bulk attendance API
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_attendance_student ON class_attendance (student_id, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_attendance_class ON class_attendance (class_id, student_id, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_attendance_term ON class_attendance (term, student_id, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_archive_term ON attendance_archive (term)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_classes_subject ON classes (subject_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_students_term ON students (term)')
+        
+        # Full-text search over students and subjects (SQLite FTS5, kept up to date by the write functions below)
+        if search_index_available(conn):
+            existing = conn.execute("SELECT name FROM sqlite_master WHERE name = 'student_search'").fetchone()
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS student_search USING fts5(roll_number, name, prefix='2 3 4')")
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS subject_search USING fts5(subject_catalog, class_title, prefix='2 3 4')")
+            if not existing:
+                rebuild_search_index(conn)
+        
+        backend.set_schema_version(conn, SCHEMA_VERSION)
+        conn.commit()
+    finally:
+        conn.close()
+
+def migrate_attendance_records(conn):
+    """Move rows of the old denormalized attendance_records table into the dimension tables"""
     conn.execute('''
-        CREATE TABLE IF NOT EXISTS students (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            roll_number TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            name TEXT,
-            institution TEXT,
-            academic_career TEXT,
-            term TEXT,
-            total_attendance_percent REAL,
-            medical_attendance_percent REAL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_login TIMESTAMP
-        )
+        INSERT INTO subjects (subject_catalog, class_title)
+        SELECT DISTINCT COALESCE(subject_catalog, ''), COALESCE(class_title, '') FROM attendance_records
+        WHERE true  -- needed by SQLite to parse INSERT ... SELECT ... ON CONFLICT
+        ON CONFLICT DO NOTHING
     ''')
-    
-    # Create attendance_records table
     conn.execute('''
-        CREATE TABLE IF NOT EXISTS attendance_records (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER,
-            class_number TEXT,
-            class_title TEXT,
-            subject_catalog TEXT,
-            academic_career TEXT,
-            institution TEXT,
-            attendance_percentage REAL,
-            scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (student_id) REFERENCES students (id)
-        )
+        INSERT INTO classes (class_number, subject_id, academic_career, institution)
+        SELECT DISTINCT COALESCE(ar.class_number, ''), s.id, COALESCE(ar.academic_career, ''), COALESCE(ar.institution, '')
+        FROM attendance_records ar
+        JOIN subjects s ON s.subject_catalog = COALESCE(ar.subject_catalog, '') AND s.class_title = COALESCE(ar.class_title, '')
+        WHERE true
+        ON CONFLICT DO NOTHING
     ''')
-    
-    # Create login_logs table
     conn.execute('''
-        CREATE TABLE IF NOT EXISTS login_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER,
-            login_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            ip_address TEXT,
-            user_agent TEXT,
-            FOREIGN KEY (student_id) REFERENCES students (id)
-        )
+        INSERT INTO class_attendance (id, student_id, class_id, attendance_percentage, scraped_at)
+        SELECT ar.id, ar.student_id, c.id, ar.attendance_percentage, ar.scraped_at
+        FROM attendance_records ar
+        JOIN subjects s ON s.subject_catalog = COALESCE(ar.subject_catalog, '') AND s.class_title = COALESCE(ar.class_title, '')
+        JOIN classes c ON c.class_number = COALESCE(ar.class_number, '') AND c.subject_id = s.id
+                      AND c.academic_career = COALESCE(ar.academic_career, '') AND c.institution = COALESCE(ar.institution, '')
     ''')
+    conn.execute('DROP TABLE attendance_records')
+
+def intern_class(conn, record):
+    """Get the classes.id for a scraped record, adding its subject and class rows if they are new"""
+    subject = (record['subject_catalog'] or '', record['class_title'] or '')
+    conn.execute('''
+        INSERT INTO subjects (subject_catalog, class_title) VALUES (?, ?)
+        ON CONFLICT DO NOTHING
+    ''', subject)
+    subject_id = conn.execute('SELECT id FROM subjects WHERE subject_catalog = ? AND class_title = ?',
+                              subject).fetchone()['id']
+    
+    klass = (record['class_number'] or '', subject_id, record['academic_career'] or '', record['institution'] or '')
+    conn.execute('''
+        INSERT INTO classes (class_number, subject_id, academic_career, institution) VALUES (?, ?, ?, ?)
+        ON CONFLICT DO NOTHING
+    ''', klass)
+    return conn.execute('''
+        SELECT id FROM classes
+        WHERE class_number = ? AND subject_id = ? AND academic_career = ? AND institution = ?
+    ''', klass).fetchone()['id']
+
+def ensure_schema():
+    """Initialize the database only if its schema is older than SCHEMA_VERSION"""
+    global _schema_checked
+    if _schema_checked:
+        return
+    
+    conn = get_db_connection()
+    try:
+        version = backend.get_schema_version(conn)
+    finally:
+        conn.close()
     
-    conn.commit()
-    conn.close()
+    if version < SCHEMA_VERSION:
+        init_db()
+    _schema_checked = True
+
+def search_index_available(conn):
+    """Check whether the FTS5 search index can be used (SQLite built with FTS5)"""
+    global _search_index
+    if _search_index is None:
+        _search_index = backend.name == 'sqlite' and any(
+            row[0] == 'ENABLE_FTS5' for row in conn.execute('PRAGMA compile_options'))
+    return _search_index
+
+def rebuild_search_index(conn):
+    """Fill the search tables from scratch from students and subjects"""
+    conn.execute('DELETE FROM student_search')
+    conn.execute('DELETE FROM subject_search')
+    conn.execute('''
+        INSERT INTO student_search (rowid, roll_number, name)
+        SELECT id, roll_number, COALESCE(name, '') FROM students
+    ''')
+    conn.execute('''
+        INSERT INTO subject_search (subject_catalog, class_title)
+        SELECT subject_catalog, class_title FROM subjects
+    ''')
+
+def index_student(conn, student_id, roll_number, name):
+    """Add or replace a student's entry in the search index"""
+    if search_index_available(conn):
+        conn.execute('DELETE FROM student_search WHERE rowid = ?', (student_id,))
+        conn.execute('INSERT INTO student_search (rowid, roll_number, name) VALUES (?, ?, ?)',
+                     (student_id, roll_number, name or ''))
+
+def index_subjects(conn, records):
+    """Add subjects that are not in the search index yet"""
+    if search_index_available(conn):
+        for subject_catalog, class_title in {(r['subject_catalog'], r['class_title']) for r in records}:
+            conn.execute('''
+                INSERT INTO subject_search (subject_catalog, class_title)
+                SELECT ?, ? WHERE NOT EXISTS (
+                    SELECT 1 FROM subject_search WHERE subject_catalog = ? AND class_title = ?
+                )
+            ''', (subject_catalog, class_title, subject_catalog, class_title))
+
+def build_match_query(text):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix"""
+    terms = re.findall(r'\w+', text.lower())
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms) + '*'
 
 def add_student(roll_number, password, name=None, institution=None, academic_career=None, term=None):
     """Add a new student to the database"""
     conn = get_db_connection()
     try:
-        conn.execute('''
+        cursor = conn.execute('''
             INSERT INTO students (roll_number, password, name, institution, academic_career, term)
             VALUES (?, ?, ?, ?, ?, ?)
         ''', (roll_number, password, name, institution, academic_career, term))
+        index_student(conn, cursor.lastrowid, roll_number, name)
         conn.commit()
         return True
-    except sqlite3.IntegrityError:
+    except IntegrityError:
         return False
     finally:
         conn.close()
@@ -78,37 +375,67 @@ def add_student(roll_number, password, name=None, institution=None, academic_car
 def get_student(roll_number):
     """Get student by roll number"""
     conn = get_db_connection()
-    student = conn.execute('SELECT * FROM students WHERE roll_number = ?', (roll_number,)).fetchone()
-    conn.close()
-    return student
+    try:
+        student = conn.execute('SELECT * FROM students WHERE roll_number = ?', (roll_number,)).fetchone()
+        return student
+    finally:
+        conn.close()
+
+def update_student_info(roll_number, name, institution, academic_career, term, total_attendance, medical_attendance):
+    """Update a student's details and attendance percentages from a scrape"""
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            UPDATE students 
+            SET name = ?, institution = ?, academic_career = ?, term = ?,
+                total_attendance_percent = ?, medical_attendance_percent = ?
+            WHERE roll_number = ?
+        ''', (name, institution, academic_career, term, total_attendance, medical_attendance, roll_number))
+        student = conn.execute('SELECT id FROM students WHERE roll_number = ?', (roll_number,)).fetchone()
+        if student:
+            index_student(conn, student['id'], roll_number, name)
+        conn.commit()
+    finally:
+        conn.close()
 
 def update_student_attendance(roll_number, total_attendance, medical_attendance):
     """Update student's attendance percentages"""
     conn = get_db_connection()
-    conn.execute('''
-        UPDATE students 
-        SET total_attendance_percent = ?, medical_attendance_percent = ?
-        WHERE roll_number = ?
-    ''', (total_attendance, medical_attendance, roll_number))
-    conn.commit()
-    conn.close()
+    try:
+        conn.execute('''
+            UPDATE students 
+            SET total_attendance_percent = ?, medical_attendance_percent = ?
+            WHERE roll_number = ?
+        ''', (total_attendance, medical_attendance, roll_number))
+        conn.commit()
+    finally:
+        conn.close()
 
-def add_attendance_records(student_id, records):
-    """Add attendance records for a student"""
+def add_attendance_records(student_id, records, term=None):
+    """Replace a student's attendance records for a term (by default the student's current term)"""
     conn = get_db_connection()
     try:
-        # Clear existing records for this student
-        conn.execute('DELETE FROM attendance_records WHERE student_id = ?', (student_id,))
+        if term is None:
+            student = conn.execute('SELECT term FROM students WHERE id = ?', (student_id,)).fetchone()
+            term = (student['term'] if student else None) or ''
+        
+        # A new term: the previous term's records move to the archive instead of being deleted
+        archive_rows(conn, 'student_id = ? AND term <> ?', (student_id, term))
+        
+        # Clear existing records for this student and term
+        conn.execute('DELETE FROM class_attendance WHERE student_id = ? AND term = ?', (student_id, term))
         
         # Insert new records
         for record in records:
             conn.execute('''
-                INSERT INTO attendance_records 
-                (student_id, class_number, class_title, subject_catalog, academic_career, institution, attendance_percentage)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (student_id, record['class_number'], record['class_title'], 
-                  record['subject_catalog'], record['academic_career'], 
-                  record['institution'], record['attendance_percentage']))
+                INSERT INTO class_attendance (student_id, class_id, attendance_percentage, term)
+                VALUES (?, ?, ?, ?)
+            ''', (student_id, intern_class(conn, record), record['attendance_percentage'], term))
+        
+        index_subjects(conn, records)
+        
+        # Bump the data version so cached page fragments for this student are re-rendered
+        conn.execute('UPDATE students SET data_version = data_version + 1 WHERE id = ?', (student_id,))
         
         conn.commit()
         return True
@@ -118,62 +445,575 @@ def add_attendance_records(student_id, records):
     finally:
         conn.close()
 
+def mark_student_scraped(student_id, fingerprint=None):
+    """Record a finished scrape; the stored page fingerprint is only replaced when one is given"""
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            UPDATE students 
+            SET last_scraped_at = CURRENT_TIMESTAMP, page_fingerprint = COALESCE(?, page_fingerprint)
+            WHERE id = ?
+        ''', (fingerprint, student_id))
+        conn.commit()
+    finally:
+        conn.close()
+
 def get_attendance_records(student_id):
     """Get attendance records for a student"""
     conn = get_db_connection()
-    records = conn.execute('''
-        SELECT * FROM attendance_records 
-        WHERE student_id = ? 
-        ORDER BY class_number
-    ''', (student_id,)).fetchall()
-    conn.close()
-    return records
+    try:
+        records = conn.execute(f'''
+            SELECT {column_list(AttendanceRecord)} FROM attendance_records 
+            WHERE student_id = ? 
+            ORDER BY class_number
+        ''', (student_id,)).fetchall()
+        return [AttendanceRecord(*record) for record in records]
+    finally:
+        conn.close()
 
 def log_login(student_id, ip_address, user_agent):
     """Log student login"""
     conn = get_db_connection()
-    conn.execute('''
-        INSERT INTO login_logs (student_id, ip_address, user_agent)
-        VALUES (?, ?, ?)
-    ''', (student_id, ip_address, user_agent))
+    try:
+        conn.execute('''
+            INSERT INTO login_logs (student_id, ip_address, user_agent)
+            VALUES (?, ?, ?)
+        ''', (student_id, ip_address, user_agent))
+        
+        # Update last login time
+        conn.execute('''
+            UPDATE students SET last_login = CURRENT_TIMESTAMP WHERE id = ?
+        ''', (student_id,))
+        
+        conn.commit()
+    finally:
+        conn.close()
+
+def save_refresh_credentials(student_id, encrypted_password):
+    """Opt a student in to background refresh with their encrypted ERP password"""
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            INSERT INTO refresh_credentials (student_id, encrypted_password)
+            VALUES (?, ?)
+            ON CONFLICT (student_id) DO UPDATE
+            SET encrypted_password = excluded.encrypted_password, opted_in_at = CURRENT_TIMESTAMP,
+                consecutive_failures = 0
+        ''', (student_id, encrypted_password))
+        conn.commit()
+    finally:
+        conn.close()
+
+def record_refresh_attempt(student_id, succeeded):
+    """Record a background refresh attempt; returns the student's consecutive failures so far"""
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            UPDATE refresh_credentials
+            SET last_attempt_at = CURRENT_TIMESTAMP,
+                consecutive_failures = CASE WHEN ? THEN 0 ELSE consecutive_failures + 1 END
+            WHERE student_id = ?
+        ''', (bool(succeeded), student_id))
+        row = conn.execute('SELECT consecutive_failures FROM refresh_credentials WHERE student_id = ?',
+                           (student_id,)).fetchone()
+        conn.commit()
+        return row['consecutive_failures'] if row else 0
+    finally:
+        conn.close()
+
+def delete_refresh_credentials(student_id):
+    """Opt a student out of background refresh and forget their ERP password"""
+    conn = get_db_connection()
+    try:
+        conn.execute('DELETE FROM refresh_credentials WHERE student_id = ?', (student_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+def get_refresh_candidates(active_since):
+    """Get opted-in students with their freshness, attendance and logins since `active_since`"""
+    conn = get_db_connection()
+    try:
+        candidates = conn.execute('''
+            SELECT s.id, s.roll_number, s.total_attendance_percent, s.last_scraped_at, s.created_at,
+                   c.encrypted_password, c.last_attempt_at, c.consecutive_failures,
+                   (SELECT COUNT(*) FROM login_logs l
+                    WHERE l.student_id = s.id AND l.login_time >= ?) AS recent_logins
+            FROM students s
+            JOIN refresh_credentials c ON c.student_id = s.id
+        ''', (active_since,)).fetchall()
+        return candidates
+    finally:
+        conn.close()
+
+def create_staff_token(name):
+    """Create a staff API token; only its hash is stored, so the token is returned once"""
+    token = secrets.token_urlsafe(32)
+    conn = get_db_connection()
+    try:
+        conn.execute('INSERT INTO staff_api_tokens (name, token_hash) VALUES (?, ?)',
+                     (name, hashlib.sha256(token.encode()).hexdigest()))
+        conn.commit()
+        return token
+    finally:
+        conn.close()
+
+def verify_staff_token(token):
+    """Get the staff token row for a presented token, or None if unknown or revoked"""
+    conn = get_db_connection()
+    try:
+        row = conn.execute('SELECT * FROM staff_api_tokens WHERE token_hash = ? AND revoked = 0',
+                           (hashlib.sha256(token.encode()).hexdigest(),)).fetchone()
+        return row
+    finally:
+        conn.close()
+
+def is_archived_term(term):
+    """Check whether any student's records for a term have moved to attendance_archive"""
+    conn = get_db_connection()
+    try:
+        return conn.execute('SELECT 1 FROM attendance_archive WHERE term = ? LIMIT 1', (term,)).fetchone() is not None
+    finally:
+        conn.close()
+
+def bulk_scan_end(term=None, after=None, scan_rows=5000):
+    """
+    The (student_id, id) key of the last row a bulk request may examine, or None if fewer are left
+    Bounds iter_bulk_attendance(until=...) to `scan_rows` rows after the cursor (of `term`, when
+    given), so filters that match few rows still cost at most that much per request.
+    """
+    conditions = []
+    params = []
+    if term:
+        conditions.append('term = ?')
+        params.append(term)
+    if after:
+        conditions.append('(student_id, id) > (?, ?)')
+        params.extend(after)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
     
-    # Update last login time
-    conn.execute('''
-        UPDATE students SET last_login = CURRENT_TIMESTAMP WHERE id = ?
-    ''', (student_id,))
+    conn = get_db_connection()
+    try:
+        row = conn.execute(f'''
+            SELECT student_id, id FROM class_attendance {where}
+            ORDER BY student_id, id LIMIT 1 OFFSET ?
+        ''', params + [scan_rows - 1]).fetchone()
+        return (row['student_id'], row['id']) if row else None
+    finally:
+        conn.close()
+
+def iter_bulk_attendance(term=None, subject=None, below=None, after=None, limit=200, until=None):
+    """
+    Yield attendance records joined with their student (BulkAttendanceRow), ordered by (student_id, id)
+    Only class_attendance is read, so a term filter matches current terms; check is_archived_term() first.
+    `after` is the (student_id, id) of the last row already returned (keyset pagination),
+    so each page is an index range scan instead of an OFFSET over everything before it.
+    `until` (see bulk_scan_end()) is the last key to examine, inclusive.
+    """
+    conditions = []
+    params = []
+    if after:
+        conditions.append('(ar.student_id, ar.id) > (?, ?)')
+        params.extend(after)
+    if until:
+        conditions.append('(ar.student_id, ar.id) <= (?, ?)')
+        params.extend(until)
+    if term:
+        conditions.append('ar.term = ?')
+        params.append(term)
+    if subject:
+        conditions.append('ar.subject_catalog = ?')
+        params.append(subject)
+    if below is not None:
+        conditions.append('ar.attendance_percentage < ?')
+        params.append(below)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
     
-    conn.commit()
-    conn.close()
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(f'''
+            SELECT ar.student_id, ar.id, s.roll_number, s.name, ar.term,
+                   ar.class_number, ar.class_title, ar.subject_catalog, ar.attendance_percentage, ar.scraped_at
+            FROM attendance_records ar
+            JOIN students s ON s.id = ar.student_id
+            {where}
+            ORDER BY ar.student_id, ar.id
+            LIMIT ?
+        ''', params + [limit])
+        while True:
+            rows = cursor.fetchmany(100)
+            if not rows:
+                break
+            for row in rows:
+                yield BulkAttendanceRow(*row)
+    finally:
+        conn.close()
 
-def get_student_stats(student_id):
-    """Get comprehensive stats for a student"""
+def search_students(text, limit=20):
+    """Find students by roll-number or name prefix, best matches first"""
     conn = get_db_connection()
+    try:
+        if search_index_available(conn):
+            query = build_match_query(text)
+            rows = conn.execute('''
+                SELECT s.id, s.roll_number, s.name, s.term, matches.score
+                FROM (
+                    SELECT rowid, bm25(student_search, 2.0, 1.0) AS score
+                    FROM student_search
+                    WHERE student_search MATCH ?
+                    ORDER BY score
+                    LIMIT ?
+                ) matches
+                JOIN students s ON s.id = matches.rowid
+                ORDER BY matches.score
+            ''', (query, limit)).fetchall() if query else []
+        else:
+            pattern = text.strip().lower()
+            rows = conn.execute('''
+                SELECT id, roll_number, name, term, 0 AS score FROM students
+                WHERE LOWER(roll_number) LIKE ? OR LOWER(name) LIKE ?
+                ORDER BY roll_number
+                LIMIT ?
+            ''', (pattern + '%', '%' + pattern + '%', limit)).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+def search_subjects(text, limit=20):
+    """Find subjects by class title or subject/catalog, best matches first"""
+    conn = get_db_connection()
+    try:
+        if search_index_available(conn):
+            query = build_match_query(text)
+            rows = conn.execute('''
+                SELECT subject_catalog, class_title, bm25(subject_search) AS score
+                FROM subject_search
+                WHERE subject_search MATCH ?
+                ORDER BY score
+                LIMIT ?
+            ''', (query, limit)).fetchall() if query else []
+        else:
+            pattern = '%' + text.strip().lower() + '%'
+            rows = conn.execute('''
+                SELECT subject_catalog, class_title, 0 AS score
+                FROM subjects
+                WHERE LOWER(subject_catalog) LIKE ? OR LOWER(class_title) LIKE ?
+                ORDER BY subject_catalog
+                LIMIT ?
+            ''', (pattern, pattern, limit)).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+def enqueue_scrape_job(student_id, roll_number, encrypted_password, max_attempts=3):
+    """Queue a scrape for a student, reusing their unfinished job if there is one; returns the job id"""
+    now = time.time()
+    conn = get_db_connection()
+    try:
+        job = conn.execute('''
+            SELECT id, status FROM scrape_jobs
+            WHERE student_id = ? AND status IN ('queued', 'running')
+            ORDER BY id DESC LIMIT 1
+        ''', (student_id,)).fetchone()
+        if job:
+            if job['status'] == 'queued':
+                # Keep the newest password in case the student changed it
+                conn.execute('UPDATE scrape_jobs SET encrypted_password = ? WHERE id = ?', (encrypted_password, job['id']))
+                conn.commit()
+            return job['id']
+        
+        cursor = conn.execute('''
+            INSERT INTO scrape_jobs (student_id, roll_number, encrypted_password, max_attempts, available_at, enqueued_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (student_id, roll_number, encrypted_password, max_attempts, now, now))
+        conn.commit()
+        job_id = cursor.lastrowid
+        if not job_id:
+            # psycopg2 reports lastrowid 0 for tables without OIDs; the job just inserted is the newest unfinished one for the student
+            job_id = conn.execute('''
+                SELECT id FROM scrape_jobs WHERE student_id = ? AND status = 'queued' ORDER BY id DESC LIMIT 1
+            ''', (student_id,)).fetchone()['id']
+        return job_id
+    finally:
+        conn.close()
+
+def claim_scrape_job(worker_id, lease_seconds):
+    """
+    Lease the oldest runnable job to a worker, or return None
+    Runnable means queued and due, or running with an expired lease (its worker died).
+    The claim is a conditional UPDATE, so two workers can never lease the same job.
+    """
+    now = time.time()
+    conn = get_db_connection()
+    try:
+        # Jobs whose lease ran out on their last allowed attempt are given up on
+        conn.execute('''
+            UPDATE scrape_jobs
+            SET status = 'failed', encrypted_password = NULL, finished_at = ?, error = 'Lease expired'
+            WHERE status = 'running' AND lease_expires_at < ? AND attempts >= max_attempts
+        ''', (now, now))
+        conn.commit()
+        
+        runnable = "((status = 'queued' AND available_at <= ?) OR (status = 'running' AND lease_expires_at < ?))"
+        for _ in range(5):
+            job = conn.execute(f'''
+                SELECT id FROM scrape_jobs WHERE {runnable} ORDER BY id LIMIT 1
+            ''', (now, now)).fetchone()
+            if not job:
+                return None
+            cursor = conn.execute(f'''
+                UPDATE scrape_jobs
+                SET status = 'running', lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1
+                WHERE id = ? AND {runnable}
+            ''', (worker_id, now + lease_seconds, job['id'], now, now))
+            conn.commit()
+            if cursor.rowcount == 1:
+                return conn.execute('SELECT * FROM scrape_jobs WHERE id = ?', (job['id'],)).fetchone()
+        return None
+    finally:
+        conn.close()
+
+def heartbeat_scrape_job(job_id, worker_id, lease_seconds):
+    """Extend a job's lease; returns False if the worker no longer holds it"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            UPDATE scrape_jobs SET lease_expires_at = ?
+            WHERE id = ? AND lease_owner = ? AND status = 'running'
+        ''', (time.time() + lease_seconds, job_id, worker_id))
+        conn.commit()
+        return cursor.rowcount == 1
+    finally:
+        conn.close()
+
+def finish_scrape_job(job_id, worker_id, succeeded, error=None, retry_delay=None):
+    """
+    Record the outcome of a leased job
+    A failed job with attempts left is queued again after retry_delay seconds when one is given.
+    The stored password is dropped once the job is finished for good.
+    """
+    now = time.time()
+    conn = get_db_connection()
+    try:
+        job = conn.execute('SELECT attempts, max_attempts FROM scrape_jobs WHERE id = ? AND lease_owner = ?',
+                           (job_id, worker_id)).fetchone()
+        if job and not succeeded and retry_delay is not None and job['attempts'] < job['max_attempts']:
+            conn.execute('''
+                UPDATE scrape_jobs
+                SET status = 'queued', available_at = ?, lease_owner = NULL, lease_expires_at = NULL, error = ?
+                WHERE id = ? AND lease_owner = ?
+            ''', (now + retry_delay, error, job_id, worker_id))
+        elif job:
+            conn.execute('''
+                UPDATE scrape_jobs
+                SET status = ?, encrypted_password = NULL, finished_at = ?, lease_expires_at = NULL, error = ?
+                WHERE id = ? AND lease_owner = ?
+            ''', ('done' if succeeded else 'failed', now, error, job_id, worker_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+def get_latest_scrape_job(student_id):
+    """Get a student's most recent scrape job, or None"""
+    conn = get_db_connection()
+    try:
+        job = conn.execute('''
+            SELECT id, status, attempts, error, enqueued_at, finished_at FROM scrape_jobs
+            WHERE student_id = ? ORDER BY id DESC LIMIT 1
+        ''', (student_id,)).fetchone()
+        return job
+    finally:
+        conn.close()
+
+def set_scrape_running(student_id, running):
+    """Mark a student's scrape as running (or no longer running) for count_pending_scrapes()"""
+    conn = get_db_connection()
+    try:
+        conn.execute(
+            f"UPDATE students SET scrape_started_at = {'CURRENT_TIMESTAMP' if running else 'NULL'} WHERE id = ?",
+            (student_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+def count_pending_scrapes(started_after):
+    """
+    Count scrapes waiting in the job queue or running in any process
+    Scrapes that started before `started_after` are left out, so a process that died
+    mid-scrape doesn't hold its slot forever.
+    """
+    conn = get_db_connection()
+    try:
+        queued = conn.execute("SELECT COUNT(*) FROM scrape_jobs WHERE status = 'queued'").fetchone()[0]
+        running = conn.execute('SELECT COUNT(*) FROM students WHERE scrape_started_at >= ?',
+                               (started_after,)).fetchone()[0]
+        return queued + running
+    finally:
+        conn.close()
+
+def pack_records(rows):
+    """Compact a term's class_attendance rows into a zlib-compressed JSON list"""
+    packed = [[row['id'], row['class_id'], row['attendance_percentage'], str(row['scraped_at'])] for row in rows]
+    return zlib.compress(json.dumps(packed, separators=(',', ':')).encode(), 9)
+
+def unpack_records(blob):
+    """Inverse of pack_records: (id, class_id, attendance_percentage, scraped_at) tuples"""
+    return [tuple(row) for row in json.loads(zlib.decompress(blob))]
+
+def archive_rows(conn, where, params=()):
+    """
+    Move class_attendance rows matching `where` into attendance_archive, grouped by student and term
+    Runs in the caller's transaction and bumps each affected student's data_version; returns the
+    number of rows moved.
+    """
+    rows = conn.execute(f'''
+        SELECT id, student_id, term, class_id, attendance_percentage, scraped_at
+        FROM class_attendance WHERE {where} ORDER BY student_id, term, id
+    ''', params).fetchall()
+    groups = {}
+    for row in rows:
+        groups.setdefault((row['student_id'], row['term']), []).append(row)
     
-    # Get student info
-    student = conn.execute('SELECT * FROM students WHERE id = ?', (student_id,)).fetchone()
-    
-    # Get attendance records
-    records = conn.execute('''
-        SELECT * FROM attendance_records 
-        WHERE student_id = ? 
-        ORDER BY attendance_percentage DESC
-    ''', (student_id,)).fetchall()
+    for (student_id, term), group in groups.items():
+        existing = conn.execute('SELECT records FROM attendance_archive WHERE student_id = ? AND term = ?',
+                                (student_id, term)).fetchone()
+        if existing:
+            # Archiving the same term twice (a student switched back): merge, newest rows win
+            merged = {record[0]: dict(zip(('id', 'class_id', 'attendance_percentage', 'scraped_at'), record))
+                      for record in unpack_records(existing['records'])}
+            merged.update((row['id'], row) for row in group)
+            group = [merged[record_id] for record_id in sorted(merged)]
+            conn.execute('DELETE FROM attendance_archive WHERE student_id = ? AND term = ?', (student_id, term))
+        conn.execute('''
+            INSERT INTO attendance_archive (student_id, term, record_count, records) VALUES (?, ?, ?, ?)
+        ''', (student_id, term, len(group), pack_records(group)))
     
-    # Get login history
-    login_history = conn.execute('''
-        SELECT login_time FROM login_logs 
-        WHERE student_id = ? 
-        ORDER BY login_time DESC 
-        LIMIT 10
-    ''', (student_id,)).fetchall()
+    conn.execute(f'DELETE FROM class_attendance WHERE {where}', params)
     
-    conn.close()
+    # The moved rows disappear from the hot table, so cached page fragments showing them are stale,
+    # and the next scrape must write them back even if the ERP page hasn't changed
+    for student_id in {student_id for student_id, _ in groups}:
+        conn.execute('UPDATE students SET data_version = data_version + 1, page_fingerprint = NULL WHERE id = ?',
+                     (student_id,))
+    return len(rows)
+
+def archive_past_terms(current_term=None):
+    """
+    Move finished terms out of class_attendance into attendance_archive
+    Without current_term, a record is past when its term differs from its student's term;
+    with it, every record of another known term is, except those of the term its student is
+    still in. Each student is moved in its own short transaction. Returns the number of records archived.
+    """
+    conn = get_db_connection()
+    try:
+        if current_term is None:
+            students = conn.execute('''
+                SELECT DISTINCT ca.student_id, COALESCE(s.term, '') AS term, COALESCE(s.term, '') AS keep_term
+                FROM class_attendance ca
+                JOIN students s ON s.id = ca.student_id
+                WHERE ca.term <> COALESCE(s.term, '')
+            ''').fetchall()
+            where = 'student_id = ? AND term <> ? AND term <> ?'
+        else:
+            # Records without a term (sample data, students never scraped) stay where they are, and so
+            # does the term a student is in until a scrape moves them on
+            students = conn.execute('''
+                SELECT DISTINCT ca.student_id, COALESCE(s.term, '') AS term, ? AS keep_term
+                FROM class_attendance ca
+                JOIN students s ON s.id = ca.student_id
+                WHERE ca.term <> ? AND ca.term <> '' AND ca.term <> COALESCE(s.term, '')
+            ''', (current_term, current_term)).fetchall()
+            where = "student_id = ? AND term <> ? AND term <> ? AND term <> ''"
+        
+        archived = 0
+        for student in students:
+            archived += archive_rows(conn, where, (student['student_id'], student['term'], student['keep_term']))
+            conn.commit()
+        return archived
+    finally:
+        conn.close()
+
+def term_records(conn, student_id, term):
+    """A student's AttendanceRecords for one term, from class_attendance or, when it has none there, the archive"""
+    records = conn.execute(f'''
+        SELECT {column_list(AttendanceRecord)} FROM attendance_records 
+        WHERE student_id = ? AND term = ?
+        ORDER BY attendance_percentage DESC
+    ''', (student_id, term)).fetchall()
+    if records:
+        return [AttendanceRecord(*record) for record in records]
     
-    return {
-        'student': dict(student) if student else None,
-        'attendance_records': [dict(record) for record in records],
-        'login_history': [dict(login) for login in login_history]
+    archived = conn.execute('SELECT records FROM attendance_archive WHERE student_id = ? AND term = ?',
+                            (student_id, term)).fetchone()
+    if not archived:
+        return []
+    rows = unpack_records(archived['records'])
+    class_ids = sorted({class_id for _, class_id, _, _ in rows})
+    classes = {
+        row['id']: row for row in conn.execute(f'''
+            SELECT c.id, c.class_number, s.class_title, s.subject_catalog, c.academic_career, c.institution
+            FROM classes c JOIN subjects s ON s.id = c.subject_id
+            WHERE c.id IN ({', '.join('?' * len(class_ids))})
+        ''', class_ids)
     }
+    records = [
+        AttendanceRecord(record_id, student_id, classes[class_id]['class_number'], classes[class_id]['class_title'],
+                         classes[class_id]['subject_catalog'], classes[class_id]['academic_career'],
+                         classes[class_id]['institution'], percentage, scraped_at, term)
+        for record_id, class_id, percentage, scraped_at in rows
+    ]
+    records.sort(key=lambda record: record.attendance_percentage, reverse=True)
+    return records
+
+def get_term_attendance(student_id, term):
+    """Get a student's attendance records for any term, current or archived"""
+    conn = get_db_connection()
+    try:
+        records = term_records(conn, student_id, term)
+        return records
+    finally:
+        conn.close()
+
+def get_student_terms(student_id):
+    """Get the terms a student has attendance records for, current and archived"""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute('''
+            SELECT term FROM class_attendance WHERE student_id = ?
+            UNION
+            SELECT term FROM attendance_archive WHERE student_id = ?
+        ''', (student_id, student_id)).fetchall()
+        return sorted(row['term'] for row in rows)
+    finally:
+        conn.close()
+
+def get_student_stats(student_id, term=None):
+    """Get comprehensive stats for a student, for the current term unless another term is given"""
+    conn = get_db_connection()
+    try:
+        # Get student info
+        student = conn.execute('SELECT * FROM students WHERE id = ?', (student_id,)).fetchone()
+        
+        # Get attendance records (the archive is only read for terms class_attendance has nothing for)
+        if term is None:
+            term = (student['term'] if student else None) or ''
+        records = term_records(conn, student_id, term)
+        
+        # Get login history
+        login_history = conn.execute('''
+            SELECT login_time FROM login_logs 
+            WHERE student_id = ? 
+            ORDER BY login_time DESC 
+            LIMIT 10
+        ''', (student_id,)).fetchall()
+        
+        return {
+            'student': dict(student) if student else None,
+            'attendance_records': records,
+            'login_history': [LoginEntry(*login) for login in login_history]
+        }
+    finally:
+        conn.close()
 
 # Initialize database when module is imported
 if __name__ == "__main__":
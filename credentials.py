@@ -0,0 +1,31 @@
+"""
+Encrypted storage of ERP passwords for students who opt in to background refresh
+The scraper needs the plaintext ERP password, so it cannot be hashed like the login
+password. It is encrypted with a Fernet key from ERP_CREDENTIAL_KEY instead
+(generate one with `python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"`).
+"""
+
+import os
+
+def _fernet():
+    key = os.environ.get('ERP_CREDENTIAL_KEY')
+    if not key:
+        raise RuntimeError("ERP_CREDENTIAL_KEY is not set")
+    from cryptography.fernet import Fernet
+    return Fernet(key.encode())
+
+def credential_storage_available():
+    """Check whether passwords can be stored for background refresh"""
+    try:
+        _fernet()
+        return True
+    except (RuntimeError, ImportError, ValueError):
+        return False
+
+def encrypt_password(password):
+    """Encrypt an ERP password for storage"""
+    return _fernet().encrypt(password.encode()).decode()
+
+def decrypt_password(token):
+    """Decrypt a stored ERP password"""
+    return _fernet().decrypt(token.encode()).decode()
@@ -0,0 +1,167 @@
+"""
+Storage backends for connectdb
+SQLite is the default. A PostgreSQL backend with a connection pool can be selected
+by pointing ERP_DB_URL at a postgresql:// URL. Both hand out connections with the
+sqlite3-style interface connectdb uses: execute(sql, params) with '?' placeholders,
+rows that support row['column'] and dict(row), commit() and close().
+"""
+
+import sqlite3
+import threading
+
+class SQLiteBackend:
+    """Single-file SQLite database (the default)"""
+
+    name = 'sqlite'
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(self, path):
+        self.path = path
+
+    def connect(self):
+        """Open a new connection"""
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def translate_ddl(self, sql):
+        """SQLite DDL is written natively, nothing to translate"""
+        return sql
+
+    def column_names(self, conn, table):
+        """Get the column names of a table"""
+        return [row['name'] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+    def table_type(self, conn, name):
+        """Get 'table' or 'view' for an existing relation, None if it doesn't exist"""
+        row = conn.execute("SELECT type FROM sqlite_master WHERE name = ? AND type IN ('table', 'view')",
+                           (name,)).fetchone()
+        return row['type'] if row else None
+
+    def get_schema_version(self, conn):
+        """Get the schema version stored in the database"""
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def set_schema_version(self, conn, version):
+        """Store the schema version in the database"""
+        conn.execute(f'PRAGMA user_version = {int(version)}')
+
+    def sync_id_sequence(self, conn, table):
+        """AUTOINCREMENT already counts rows inserted with explicit ids"""
+
+    def close(self):
+        """Nothing is pooled for SQLite"""
+
+class PooledConnection:
+    """sqlite3-style wrapper around a connection borrowed from a psycopg2 pool"""
+
+    def __init__(self, pool, cursor_factory, release):
+        self._pool = pool
+        self._conn = pool.getconn()
+        self._cursor_factory = cursor_factory
+        self._release = release
+
+    def execute(self, sql, params=()):
+        """Run a statement written with '?' placeholders and return its cursor"""
+        cursor = self._conn.cursor(cursor_factory=self._cursor_factory)
+        cursor.execute(sql.replace('%', '%%').replace('?', '%s'), tuple(params))
+        return cursor
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        """Roll back anything uncommitted and return the connection to the pool"""
+        if self._conn is not None:
+            try:
+                self._conn.rollback()
+            finally:
+                # A broken connection is discarded instead of going back to the pool
+                self._pool.putconn(self._conn, close=self._conn.closed != 0)
+                self._conn = None
+                self._release()
+
+class PostgresBackend:
+    """PostgreSQL (or a wire-compatible engine) behind a thread-safe connection pool"""
+
+    name = 'postgresql'
+
+    def __init__(self, url, max_connections=10, timeout=30):
+        try:
+            import psycopg2
+            import psycopg2.extras
+            import psycopg2.pool
+        except ImportError as e:
+            raise RuntimeError(f"psycopg2 is required for ERP_DB_URL={url!r}: {e}")
+        self.url = url
+        self.IntegrityError = psycopg2.IntegrityError
+        self._pool = psycopg2.pool.ThreadedConnectionPool(1, max_connections, url)
+        self._cursor_factory = psycopg2.extras.DictCursor
+        self._pool_error = psycopg2.pool.PoolError
+        # ThreadedConnectionPool raises as soon as it is exhausted; callers queue here instead
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self.timeout = timeout
+
+    def connect(self):
+        """Borrow a connection from the pool, waiting up to `timeout` seconds for one; close() gives it back"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise self._pool_error(f"No database connection became free within {self.timeout}s")
+        try:
+            return PooledConnection(self._pool, self._cursor_factory, self._slots.release)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def translate_ddl(self, sql):
+        """Translate the SQLite-flavoured DDL used by init_db()"""
+        return sql.replace('INTEGER PRIMARY KEY AUTOINCREMENT', 'SERIAL PRIMARY KEY').replace(' BLOB', ' BYTEA')
+
+    def column_names(self, conn, table):
+        """Get the column names of a table"""
+        rows = conn.execute('''
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = ?
+        ''', (table,)).fetchall()
+        return [row['column_name'] for row in rows]
+
+    def table_type(self, conn, name):
+        """Get 'table' or 'view' for an existing relation, None if it doesn't exist"""
+        row = conn.execute('''
+            SELECT table_type FROM information_schema.tables
+            WHERE table_schema = current_schema() AND table_name = ?
+        ''', (name,)).fetchone()
+        if not row:
+            return None
+        return 'view' if row['table_type'] == 'VIEW' else 'table'
+
+    def get_schema_version(self, conn):
+        """Get the schema version stored in the database"""
+        conn.execute('CREATE TABLE IF NOT EXISTS schema_meta (version INTEGER NOT NULL)')
+        row = conn.execute('SELECT version FROM schema_meta').fetchone()
+        conn.commit()
+        return row['version'] if row else 0
+
+    def set_schema_version(self, conn, version):
+        """Store the schema version in the database"""
+        conn.execute('CREATE TABLE IF NOT EXISTS schema_meta (version INTEGER NOT NULL)')
+        conn.execute('DELETE FROM schema_meta')
+        conn.execute('INSERT INTO schema_meta (version) VALUES (?)', (int(version),))
+
+    def sync_id_sequence(self, conn, table):
+        """Move a SERIAL id sequence past rows that were inserted with explicit ids"""
+        conn.execute(f"SELECT setval(pg_get_serial_sequence(?, 'id'), MAX(id)) FROM {table}", (table,))
+
+    def close(self):
+        """Close every pooled connection"""
+        self._pool.closeall()
+
+def create_backend(url, pool_size=10, pool_timeout=30):
+    """Create a backend from a postgresql:// URL or a SQLite file path"""
+    if url.startswith(('postgresql://', 'postgres://')):
+        return PostgresBackend(url, pool_size, pool_timeout)
+    if url.startswith('sqlite:///'):
+        url = url[len('sqlite:///'):]
+    return SQLiteBackend(url)
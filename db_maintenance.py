@@ -0,0 +1,215 @@
+"""
+Online maintenance for the SQLite database
+Backups, incremental vacuum and planner statistics, all done in short slices with
+pauses in between so requests never wait long on the maintenance connection:
+
+- backups copy a snapshot of the live database through SQLite's backup API a few
+  pages per step into backups/, keeping the newest ERP_BACKUP_KEEP copies
+- incremental vacuum returns the free pages left by add_attendance_records'
+  delete-and-reinsert churn, a chunk per transaction (needs auto_vacuum=INCREMENTAL,
+  which new databases get from init_db and existing ones from --enable-incremental-vacuum)
+- ANALYZE runs table by table under an analysis_limit, followed by PRAGMA optimize
+
+Run it as a single dedicated process next to the web workers:
+    flask --app app db-maintenance
+PostgreSQL deployments rely on autovacuum and pg_dump instead.
+"""
+
+import glob
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import metrics
+import connectdb
+
+class BackupRestarted(Exception):
+    """The source database kept changing under an online backup"""
+
+def _connect(timeout=1.0):
+    """Autocommit connection for maintenance; a short busy timeout makes it back off, not block"""
+    return sqlite3.connect(connectdb.backend.path, timeout=timeout, isolation_level=None)
+
+def backup_database(backup_dir='backups', pages=256, pause=0.05, max_restarts=5, keep=7):
+    """
+    Copy the live database to backup_dir through the backup API, `pages` pages per step
+    In WAL mode (set by init_db) the copy reads one snapshot that writers never wait on.
+    Otherwise the source is only read-locked during a step, and a write from another
+    connection makes SQLite restart the copy; after max_restarts the backup gives up
+    (BackupRestarted) and is retried on the next run. Returns the path of the new backup.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    name = f"student_erp-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.db"
+    path = os.path.join(backup_dir, name)
+    partial = path + '.partial'
+
+    restarts = 0
+    previous_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, previous_remaining
+        if previous_remaining is not None and remaining > previous_remaining:
+            restarts += 1
+            if restarts > max_restarts:
+                raise BackupRestarted(f"Backup restarted {restarts} times, giving up for now")
+        previous_remaining = remaining
+        # The read lock is released between steps; sqlite3's own sleep only applies when busy
+        if remaining:
+            time.sleep(pause)
+
+    started = time.perf_counter()
+    source = _connect()
+    target = sqlite3.connect(partial)
+    try:
+        if source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal':
+            # Holding a read transaction pins the snapshot, so concurrent writes don't restart the copy
+            source.execute('BEGIN')
+            source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        source.backup(target, pages=pages, progress=progress, sleep=pause)
+        check = target.execute('PRAGMA quick_check').fetchone()[0]
+        if check != 'ok':
+            raise sqlite3.DatabaseError(f"Backup failed quick_check: {check}")
+    except BaseException:
+        target.close()
+        os.remove(partial)
+        metrics.increment('maintenance.backup_failed')
+        raise
+    finally:
+        if source.in_transaction:
+            source.execute('COMMIT')
+        source.close()
+    target.close()
+    os.replace(partial, path)
+
+    metrics.increment('maintenance.backups')
+    metrics.increment('maintenance.backup_seconds', time.perf_counter() - started)
+    print(f"Backed up database to {path} ({restarts} restarts, {time.perf_counter() - started:.1f} s)")
+    prune_backups(backup_dir, keep)
+    return path
+
+def prune_backups(backup_dir, keep):
+    """Delete all but the newest `keep` backups"""
+    backups = sorted(glob.glob(os.path.join(backup_dir, 'student_erp-*.db')))
+    for path in backups[:-keep] if keep else []:
+        os.remove(path)
+
+def incremental_vacuum(pages=64, pause=0.1, max_seconds=120):
+    """Release free pages back to the filesystem, `pages` per transaction; returns pages released"""
+    conn = _connect()
+    released = 0
+    deadline = time.monotonic() + max_seconds
+    try:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            print("Incremental vacuum skipped: auto_vacuum is not INCREMENTAL (see --enable-incremental-vacuum)")
+            return 0
+        while time.monotonic() < deadline:
+            free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if not free:
+                break
+            chunk = min(free, pages)
+            try:
+                # sqlite3 steps the pragma only once, releasing a single page per execute
+                conn.execute('BEGIN IMMEDIATE')
+                for _ in range(chunk):
+                    conn.execute('PRAGMA incremental_vacuum')
+                conn.execute('COMMIT')
+                released += chunk
+            except sqlite3.OperationalError:
+                # Busy: a request is writing, so give way and try again after the pause
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+            time.sleep(pause)
+    finally:
+        conn.close()
+    metrics.increment('maintenance.vacuum_pages', released)
+    return released
+
+def analyze(analysis_limit=1000, pause=0.05):
+    """Refresh planner statistics one table at a time, then let PRAGMA optimize do the rest"""
+    conn = _connect()
+    try:
+        # Each ANALYZE samples at most about analysis_limit rows per index
+        conn.execute(f'PRAGMA analysis_limit = {int(analysis_limit)}')
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+            "AND sql NOT LIKE 'CREATE VIRTUAL TABLE%'")]
+        analyzed = 0
+        for table in tables:
+            try:
+                conn.execute(f'ANALYZE "{table}"')
+                analyzed += 1
+            except sqlite3.OperationalError:
+                pass  # busy or a shadow table of the search index; the next run catches up
+            time.sleep(pause)
+        conn.execute('PRAGMA optimize')
+    finally:
+        conn.close()
+    metrics.increment('maintenance.analyze_runs')
+    return analyzed
+
+def enable_incremental_vacuum():
+    """
+    Switch an existing database to auto_vacuum=INCREMENTAL
+    This needs one full VACUUM, which locks the database while it rewrites it: run it
+    once, outside busy hours. Databases created by init_db start out incremental.
+    """
+    conn = _connect(timeout=30)
+    try:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            return False
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+    finally:
+        conn.close()
+    return True
+
+class MaintenanceScheduler:
+    """Runs backups and vacuum/ANALYZE passes on their own intervals"""
+
+    def __init__(self, backup_dir='backups', backup_hours=24, vacuum_hours=6, keep=7, poll_seconds=60):
+        self.backup_dir = backup_dir
+        self.backup_seconds = backup_hours * 3600
+        self.vacuum_seconds = vacuum_hours * 3600
+        self.keep = keep
+        self.poll_seconds = poll_seconds
+        self._last_backup = None
+        self._last_vacuum = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls):
+        """Build a scheduler configured by ERP_BACKUP_* / ERP_MAINTENANCE_* environment variables"""
+        return cls(
+            backup_dir=os.environ.get('ERP_BACKUP_DIR', 'backups'),
+            backup_hours=float(os.environ.get('ERP_BACKUP_INTERVAL_HOURS', 24)),
+            vacuum_hours=float(os.environ.get('ERP_MAINTENANCE_INTERVAL_HOURS', 6)),
+            keep=int(os.environ.get('ERP_BACKUP_KEEP', 7)),
+        )
+
+    def tick(self):
+        """Run whatever is due"""
+        now = time.monotonic()
+        if self._last_backup is None or now - self._last_backup >= self.backup_seconds:
+            try:
+                backup_database(self.backup_dir, keep=self.keep)
+                self._last_backup = now
+            except (BackupRestarted, sqlite3.Error, OSError) as e:
+                print(f"Backup failed, retrying on the next tick: {e}")
+        if self._last_vacuum is None or now - self._last_vacuum >= self.vacuum_seconds:
+            released = incremental_vacuum()
+            analyzed = analyze()
+            print(f"Maintenance: released {released} free pages, analyzed {analyzed} tables")
+            self._last_vacuum = now
+
+    def run_forever(self):
+        """Tick every poll_seconds until stop() is called"""
+        print(f"Database maintenance started (backups to {self.backup_dir}/)")
+        while not self._stop.is_set():
+            self.tick()
+            self._stop.wait(self.poll_seconds)
+
+    def stop(self):
+        """Stop after the current tick"""
+        self._stop.set()
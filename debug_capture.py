@@ -0,0 +1,229 @@
+"""
+Compressed, sampled archive of scraped ERP pages for debugging parser issues
+Pages are stored content-addressed (by SHA-256) and compressed with zstd when the
+zstandard package is installed, gzip otherwise. Writes happen on a background
+thread so the scrape path only pays for a queue put. Every failed scrape is
+captured; successful scrapes are sampled at ERP_DEBUG_SAMPLE_RATE. Old captures
+are pruned by age and total archive size, at most every ERP_DEBUG_PRUNE_SECONDS
+across all processes writing to the archive.
+
+Several processes (web workers, scrape subprocesses) may write to the same archive,
+so an object file only counts as orphaned once it is older than PRUNE_GRACE_SECONDS:
+a writer publishes or touches the file first and inserts its index row right after.
+
+Look up the latest capture for a student with:
+    python debug_capture.py BE23CS013 [output.html]
+"""
+
+import gzip
+import hashlib
+import os
+import queue
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+import metrics
+
+ARCHIVE_DIR = os.environ.get('ERP_DEBUG_ARCHIVE', 'debug_archive')
+SAMPLE_RATE = float(os.environ.get('ERP_DEBUG_SAMPLE_RATE', 0.05))  # fraction of successful scrapes kept
+MAX_AGE_DAYS = float(os.environ.get('ERP_DEBUG_MAX_AGE_DAYS', 14))
+MAX_BYTES = int(os.environ.get('ERP_DEBUG_MAX_BYTES', 200 * 1024 * 1024))
+PRUNE_SECONDS = float(os.environ.get('ERP_DEBUG_PRUNE_SECONDS', 600))
+PRUNE_GRACE_SECONDS = 3600
+
+try:
+    import zstandard
+    EXTENSION = '.html.zst'
+    def _compress(data):
+        return zstandard.ZstdCompressor(level=10).compress(data)
+except ImportError:
+    zstandard = None
+    EXTENSION = '.html.gz'
+    def _compress(data):
+        return gzip.compress(data, compresslevel=6)
+
+def _decompress(path, data):
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+_queue = queue.Queue(maxsize=100)
+_writer = None
+_writer_lock = threading.Lock()
+
+def _index_connection():
+    os.makedirs(os.path.join(ARCHIVE_DIR, 'objects'), exist_ok=True)
+    conn = sqlite3.connect(os.path.join(ARCHIVE_DIR, 'index.db'))
+    conn.row_factory = sqlite3.Row
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS captures (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            roll_number TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            failed INTEGER NOT NULL,
+            reason TEXT,
+            captured_at REAL NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_captures_roll ON captures (roll_number, captured_at)')
+    return conn
+
+def should_capture(failed):
+    """Decide whether a page is archived: always on failure, sampled on success"""
+    return failed or random.random() < SAMPLE_RATE
+
+def capture_page(roll_number, page_html, failed=False, reason=None):
+    """Queue a page for archiving without blocking the scrape; returns whether it was queued"""
+    if not page_html or not should_capture(failed):
+        return False
+    _ensure_writer()
+    try:
+        _queue.put_nowait((roll_number, page_html, failed, reason, time.time()))
+    except queue.Full:
+        metrics.increment('debug_capture.dropped')
+        return False
+    return True
+
+def _ensure_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_write_loop, name='debug-capture-writer', daemon=True)
+            _writer.start()
+
+def _write_loop():
+    conn = _index_connection()
+    while True:
+        item = _queue.get()
+        try:
+            _store(conn, *item)
+            if _prune_due():
+                prune(conn)
+        except Exception as e:
+            print(f"Error archiving debug page: {e}")
+        finally:
+            _queue.task_done()
+
+def _prune_due():
+    """Claim the next prune if the last one, by any process, was PRUNE_SECONDS ago"""
+    marker = os.path.join(ARCHIVE_DIR, 'last_prune')
+    try:
+        if time.time() - os.path.getmtime(marker) < PRUNE_SECONDS:
+            return False
+    except FileNotFoundError:
+        pass
+    # Scrape subprocesses only live for one capture, so the schedule is kept on disk
+    with open(marker, 'w'):
+        pass
+    return True
+
+def _store(conn, roll_number, page_html, failed, reason, captured_at):
+    data = page_html.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+    path = os.path.join(ARCHIVE_DIR, 'objects', digest[:2], digest + EXTENSION)
+    try:
+        # Reusing an existing object: a fresh mtime keeps another process's prune off it
+        os.utime(path)
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = _compress(data)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+        metrics.increment('debug_capture.bytes_written', len(compressed))
+    conn.execute('''
+        INSERT INTO captures (roll_number, digest, path, size, failed, reason, captured_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (roll_number, digest, path, os.path.getsize(path), int(failed), reason, captured_at))
+    conn.commit()
+    metrics.increment('debug_capture.captured')
+
+def prune(conn=None, max_age_days=None, max_bytes=None):
+    """Drop captures older than max_age_days, then the oldest ones until the archive fits max_bytes"""
+    own_conn = conn is None
+    conn = conn or _index_connection()
+    max_age_days = MAX_AGE_DAYS if max_age_days is None else max_age_days
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    try:
+        conn.execute('DELETE FROM captures WHERE captured_at < ?', (time.time() - max_age_days * 86400,))
+        # Each stored object counts once, however many captures point at it
+        objects = conn.execute('''
+            SELECT digest, path, size, MAX(captured_at) AS last_seen FROM captures
+            GROUP BY digest ORDER BY last_seen
+        ''').fetchall()
+        total = sum(row['size'] for row in objects)
+        for row in objects:
+            if total <= max_bytes:
+                break
+            conn.execute('DELETE FROM captures WHERE digest = ?', (row['digest'],))
+            total -= row['size']
+        conn.commit()
+
+        # Remove objects no capture refers to any more, unless a writer may be about to index them
+        referenced = {row['path'] for row in conn.execute('SELECT DISTINCT path FROM captures')}
+        objects_dir = os.path.join(ARCHIVE_DIR, 'objects')
+        grace_cutoff = time.time() - PRUNE_GRACE_SECONDS
+        for dirpath, _, filenames in os.walk(objects_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if path in referenced or filename.endswith('.tmp'):
+                    continue
+                try:
+                    if os.path.getmtime(path) < grace_cutoff:
+                        os.remove(path)
+                        metrics.increment('debug_capture.pruned')
+                except FileNotFoundError:
+                    pass  # another process pruned it first
+    finally:
+        if own_conn:
+            conn.close()
+
+def find_captures(roll_number, limit=10):
+    """Get the most recent captures for a roll number, newest first"""
+    conn = _index_connection()
+    rows = conn.execute('''
+        SELECT * FROM captures WHERE roll_number = ?
+        ORDER BY captured_at DESC LIMIT ?
+    ''', (roll_number, limit)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def load_capture(capture):
+    """Get the decompressed HTML of a capture returned by find_captures()"""
+    with open(capture['path'], 'rb') as f:
+        return _decompress(capture['path'], f.read()).decode('utf-8')
+
+def flush(timeout=None):
+    """Wait until every queued page has been written (used by tests and on shutdown)"""
+    if timeout is None:
+        _queue.join()
+        return True
+    deadline = time.time() + timeout
+    while _queue.unfinished_tasks and time.time() < deadline:
+        time.sleep(0.05)
+    return not _queue.unfinished_tasks
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python debug_capture.py ROLL_NUMBER [output.html]")
+        sys.exit(1)
+    captures = find_captures(sys.argv[1])
+    if not captures:
+        print(f"No captured pages for {sys.argv[1]}")
+        sys.exit(1)
+    for capture in captures:
+        status = f"failed: {capture['reason']}" if capture['failed'] else "ok"
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(capture['captured_at']))}  "
+              f"{capture['digest'][:12]}  {status}")
+    output = sys.argv[2] if len(sys.argv) > 2 else f"debug_page_{sys.argv[1]}.html"
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(load_capture(captures[0]))
+    print(f"Latest capture written to {output}")
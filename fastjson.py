@@ -0,0 +1,39 @@
+"""
+JSON encoding for the API endpoints
+Uses orjson, which requirements.txt installs. The stdlib json fallback only keeps
+checkouts without it working and is slower on rows.py objects. Both paths produce
+the same document for the payloads the API returns: dicts/lists of plain values,
+row objects from rows.py and datetimes.
+"""
+
+import datetime
+import json
+from operator import attrgetter
+
+from rows import RowAccess
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    print("Warning: orjson is not installed, API responses are encoded with the slower json module")
+
+BACKEND = 'orjson' if orjson else 'json'
+
+# Row type -> (field names, getter returning all fields as a tuple) for the stdlib path
+_row_getters = {}
+
+def _default(obj):
+    if isinstance(obj, RowAccess):
+        names, getter = _row_getters.get(type(obj)) or _row_getters.setdefault(
+            type(obj), (obj.__slots__, attrgetter(*obj.__slots__)))
+        return dict(zip(names, getter(obj)))
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    return str(obj)
+
+def dumps(obj):
+    """Encode obj as compact JSON bytes"""
+    if orjson:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode()
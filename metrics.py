@@ -0,0 +1,29 @@
+"""
+In-process counters for the Student ERP System
+Counters are per worker process and are exposed as JSON through /api/metrics
+"""
+
+import threading
+
+_lock = threading.Lock()
+_counters = {}
+
+def increment(name, amount=1):
+    """Add `amount` to the counter called `name`"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+def get(name):
+    """Get the current value of a counter"""
+    with _lock:
+        return _counters.get(name, 0)
+
+def snapshot():
+    """Get a copy of all counters"""
+    with _lock:
+        return dict(_counters)
+
+def reset():
+    """Clear all counters"""
+    with _lock:
+        _counters.clear()
@@ -0,0 +1,188 @@
+"""
+Background refresh scheduler
+Re-scrapes students who opted in to background refresh outside quiet hours, so most
+logins find fresh data already stored. Candidates are ordered by how stale their
+data is, how often they log in, and whether they are close to the low-attendance
+threshold; at most `max_concurrent` scrapes run at once. A student whose refresh failed
+is retried with exponential backoff, and their stored password is dropped after
+`max_login_failures` failed ERP logins in a row, so a changed password doesn't mean
+a rejected login every tick all night.
+
+Run it as a single dedicated process:
+    flask --app app refresh-scheduler
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import metrics
+from circuit_breaker import erp_breaker, OPEN
+from connectdb import get_refresh_candidates, record_refresh_attempt, delete_refresh_credentials, LOW_ATTENDANCE_THRESHOLD
+from credentials import decrypt_password
+
+# Students within this many points of the threshold get their priority multiplied
+NEAR_THRESHOLD_MARGIN = 5
+NEAR_THRESHOLD_BOOST = 3
+
+def parse_timestamp(value):
+    """Convert a stored timestamp (text on SQLite, datetime on PostgreSQL) to a datetime"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+def parse_hours(value):
+    """Parse a quiet-hours range such as '8-18' (or '22-6' across midnight)"""
+    if not value:
+        return None
+    start, end = value.split('-')
+    return int(start), int(end)
+
+def refresh_priority(candidate, now, min_age_hours):
+    """Score a candidate; higher is more urgent, None means it is too fresh to refresh"""
+    last_scraped = parse_timestamp(candidate['last_scraped_at'] or candidate['created_at'])
+    staleness_hours = (now - last_scraped).total_seconds() / 3600 if last_scraped else float(min_age_hours)
+    if staleness_hours < min_age_hours:
+        return None
+
+    priority = staleness_hours * (1 + candidate['recent_logins'])
+    percent = candidate['total_attendance_percent']
+    if percent is not None and abs(percent - LOW_ATTENDANCE_THRESHOLD) <= NEAR_THRESHOLD_MARGIN:
+        priority *= NEAR_THRESHOLD_BOOST
+    return priority
+
+def retry_due(candidate, now, retry_minutes, max_retry_hours):
+    """After failed refreshes, wait retry_minutes, doubling per failure up to max_retry_hours"""
+    failures = candidate['consecutive_failures']
+    last_attempt = parse_timestamp(candidate['last_attempt_at'])
+    if not failures or last_attempt is None:
+        return True
+    backoff_minutes = min(retry_minutes * 2 ** (failures - 1), max_retry_hours * 60)
+    return now - last_attempt >= timedelta(minutes=backoff_minutes)
+
+class RefreshScheduler:
+    """Periodically picks the most urgent opted-in students and re-scrapes them"""
+
+    def __init__(self, scrape_job, max_concurrent=2, quiet_hours=(8, 18), min_age_hours=6,
+                 activity_window_days=14, poll_seconds=60, retry_minutes=30, max_retry_hours=24,
+                 max_login_failures=3):
+        # Called as scrape_job(roll_number, password); returns a scraping status dict
+        self.scrape_job = scrape_job
+        self.max_concurrent = max_concurrent
+        self.quiet_hours = quiet_hours
+        self.min_age_hours = min_age_hours
+        self.retry_minutes = retry_minutes
+        self.max_retry_hours = max_retry_hours
+        self.max_login_failures = max_login_failures
+        self.activity_window_days = activity_window_days
+        self.poll_seconds = poll_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent)
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls, scrape_job):
+        """Build a scheduler configured by ERP_REFRESH_* environment variables"""
+        return cls(
+            scrape_job,
+            max_concurrent=int(os.environ.get('ERP_REFRESH_CONCURRENCY', 2)),
+            quiet_hours=parse_hours(os.environ.get('ERP_REFRESH_QUIET_HOURS', '8-18')),
+            min_age_hours=float(os.environ.get('ERP_REFRESH_MIN_AGE_HOURS', 6)),
+            poll_seconds=float(os.environ.get('ERP_REFRESH_POLL_SECONDS', 60)),
+            retry_minutes=float(os.environ.get('ERP_REFRESH_RETRY_MINUTES', 30)),
+            max_login_failures=int(os.environ.get('ERP_REFRESH_MAX_LOGIN_FAILURES', 3)),
+        )
+
+    def in_quiet_hours(self, now=None):
+        """Check whether background scrapes are paused at this local time"""
+        if not self.quiet_hours:
+            return False
+        hour = (now or datetime.now()).hour
+        start, end = self.quiet_hours
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end
+
+    def next_batch(self):
+        """Get the most urgent candidates that fit in the free concurrency budget"""
+        with self._lock:
+            free_slots = self.max_concurrent - len(self._in_flight)
+            in_flight = set(self._in_flight)
+        if free_slots <= 0:
+            return []
+
+        now = datetime.utcnow()  # stored timestamps are UTC (CURRENT_TIMESTAMP)
+        active_since = (now - timedelta(days=self.activity_window_days)).strftime('%Y-%m-%d %H:%M:%S')
+        scored = []
+        for candidate in get_refresh_candidates(active_since):
+            if candidate['id'] in in_flight:
+                continue
+            if not retry_due(candidate, now, self.retry_minutes, self.max_retry_hours):
+                continue
+            priority = refresh_priority(candidate, now, self.min_age_hours)
+            if priority is not None:
+                scored.append((priority, candidate))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [candidate for _, candidate in scored[:free_slots]]
+
+    def tick(self):
+        """Start scrapes for the next batch; returns how many were started"""
+        if self.in_quiet_hours() or erp_breaker.state == OPEN:
+            return 0
+
+        started = 0
+        for candidate in self.next_batch():
+            try:
+                password = decrypt_password(candidate['encrypted_password'])
+            except Exception as e:
+                print(f"Could not decrypt refresh credentials for {candidate['roll_number']}: {e}")
+                metrics.increment('refresh.credential_errors')
+                continue
+            with self._lock:
+                self._in_flight.add(candidate['id'])
+            self._executor.submit(self._run, candidate['id'], candidate['roll_number'], password)
+            metrics.increment('refresh.started')
+            started += 1
+        return started
+
+    def _run(self, student_id, roll_number, password):
+        start = time.perf_counter()
+        try:
+            result = self.scrape_job(roll_number, password) or {}
+            self._record(student_id, roll_number, result)
+        finally:
+            with self._lock:
+                self._in_flight.discard(student_id)
+            metrics.increment('refresh.completed')
+            metrics.increment('refresh.seconds', time.perf_counter() - start)
+
+    def _record(self, student_id, roll_number, result):
+        """Reset or extend the student's backoff, dropping credentials the ERP keeps rejecting"""
+        if result.get('status') == 'stale':
+            return  # the circuit breaker stopped it before the ERP was contacted
+        succeeded = result.get('status') == 'completed'
+        failures = record_refresh_attempt(student_id, succeeded)
+        if succeeded:
+            return
+        metrics.increment('refresh.failed')
+        if result.get('login_failed') and failures >= self.max_login_failures:
+            delete_refresh_credentials(student_id)
+            metrics.increment('refresh.credentials_dropped')
+            print(f"Dropped refresh credentials for {roll_number} after {failures} failed refreshes")
+
+    def run_forever(self):
+        """Tick every poll_seconds until stop() is called"""
+        print(f"Background refresh started (max {self.max_concurrent} concurrent, quiet hours {self.quiet_hours})")
+        try:
+            while not self._stop.is_set():
+                self.tick()
+                self._stop.wait(self.poll_seconds)
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def stop(self):
+        """Stop after the current tick; running scrapes are allowed to finish"""
+        self._stop.set()
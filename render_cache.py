@@ -0,0 +1,111 @@
+"""
+Fragment cache for the expensive blocks of attendance.html and dashboard.html
+A student's attendance table, subject analysis and chart data only change after a
+scrape commits, so each fragment is rendered once per (student_id, data_version)
+and served from an LRU cache bounded by entry count and total size.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import render_template
+from markupsafe import Markup
+
+import metrics
+from connectdb import get_student_stats
+
+# Fragment name -> partial template that renders it
+FRAGMENT_TEMPLATES = {
+    'attendance_table': '_attendance_table.html',
+    'subject_analysis': '_subject_analysis.html',
+    'chart_data': '_chart_data.html',
+}
+
+class FragmentCache:
+    """Thread-safe LRU cache of rendered HTML fragments"""
+
+    def __init__(self, max_entries=4096, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (student_id, data_version, name) -> (html, render_seconds)
+        self._student_keys = {}  # student_id -> set of that student's keys in _entries
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get (html, render_seconds) for a key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, html, render_seconds):
+        """Store a fragment, dropping older versions for the student and evicting LRU entries"""
+        student_id, data_version, _ = key
+        with self._lock:
+            for stale in [k for k in self._student_keys.get(student_id, ()) if k[1] < data_version]:
+                self._remove(stale)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (html, render_seconds)
+            self._student_keys.setdefault(student_id, set()).add(key)
+            self._bytes += len(html)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                metrics.increment('fragment_cache.evictions')
+
+    def clear(self):
+        """Drop every cached fragment"""
+        with self._lock:
+            self._entries.clear()
+            self._student_keys.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Get current size of the cache"""
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes}
+
+    def _remove(self, key):
+        html, _ = self._entries.pop(key)
+        self._bytes -= len(html)
+        keys = self._student_keys[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._student_keys[key[0]]
+
+fragment_cache = FragmentCache()
+
+def render_fragment(name, student_id, data_version, **context):
+    """Render a fragment, or return the cached copy for this student and data version"""
+    key = (student_id, data_version, name)
+    cached = fragment_cache.get(key)
+    if cached is not None:
+        html, render_seconds = cached
+        metrics.increment('fragment_cache.hits')
+        metrics.increment('fragment_cache.render_seconds_saved', render_seconds)
+        return Markup(html)
+
+    start = time.perf_counter()
+    html = render_template(FRAGMENT_TEMPLATES[name], **context)
+    render_seconds = time.perf_counter() - start
+    fragment_cache.put(key, html, render_seconds)
+    metrics.increment('fragment_cache.misses')
+    metrics.increment('fragment_cache.render_seconds', render_seconds)
+    return Markup(html)
+
+def render_fragments(names, student, attendance_records):
+    """Render several fragments for one student, keyed by the student's data version"""
+    return {
+        name: render_fragment(name, student['id'], student['data_version'],
+                              attendance_records=attendance_records)
+        for name in names
+    }
+
+def prerender_student(student_id):
+    """Render every fragment for a student right after a scrape commits (needs an app context)"""
+    stats = get_student_stats(student_id)
+    if stats['student']:
+        render_fragments(FRAGMENT_TEMPLATES, stats['student'], stats['attendance_records'])
@@ -0,0 +1,67 @@
+"""
+Compact row types returned by the data layer
+Each row is a __slots__ dataclass built straight from the cursor's tuple, so a result
+set costs one small object per row instead of a sqlite3.Row plus a copied dict.
+Templates and existing code keep working: Jinja reads fields as attributes and
+row['field'] still works. orjson serializes these natively; fastjson.py covers the
+stdlib fallback.
+"""
+
+from dataclasses import dataclass, fields
+
+class RowAccess:
+    """Mapping-style access for code written against dict rows"""
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return self.__slots__
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+@dataclass(slots=True)
+class AttendanceRecord(RowAccess):
+    """One row of the attendance_records view"""
+    id: int
+    student_id: int
+    class_number: str
+    class_title: str
+    subject_catalog: str
+    academic_career: str
+    institution: str
+    attendance_percentage: float
+    scraped_at: str
+    term: str
+
+@dataclass(slots=True)
+class LoginEntry(RowAccess):
+    """One login_logs timestamp"""
+    login_time: str
+
+@dataclass(slots=True)
+class BulkAttendanceRow(RowAccess):
+    """An attendance record joined with its student, as served by the staff bulk API"""
+    student_id: int
+    id: int
+    roll_number: str
+    name: str
+    term: str
+    class_number: str
+    class_title: str
+    subject_catalog: str
+    attendance_percentage: float
+    scraped_at: str
+
+def column_list(row_type, alias=None):
+    """SELECT column list in the row type's field order, so rows can be built positionally"""
+    prefix = f"{alias}." if alias else ''
+    return ', '.join(prefix + field.name for field in fields(row_type))
@@ -0,0 +1,211 @@
+"""
+Run each scrape in an isolated subprocess under a watchdog
+A hung chromedriver used to pin its scrape thread, the Chrome processes and their memory
+until the server restarted. Now every scrape runs in a child process started in its own
+session (process group on Windows). The parent enforces a wall-clock deadline and a memory
+ceiling on the child's whole process tree, Chrome and chromedriver included, and kills the
+tree when either is exceeded or once the scrape has finished, so no browser outlives it.
+The result is taken as soon as the child writes it; the child then gets FLUSH_GRACE_SECONDS
+in the background to finish writing debug pages.
+
+The password and result travel over the child's stdin/stdout as JSON, never on the
+command line.
+"""
+
+import importlib
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import metrics
+
+# Wall-clock limit for one scrape, login to parsed table
+TIMEOUT_SECONDS = float(os.environ.get('ERP_SCRAPE_TIMEOUT_SECONDS', 180))
+
+# Resident memory limit for the scrape's whole process tree (Linux only, read from /proc)
+MEMORY_LIMIT_MB = float(os.environ.get('ERP_SCRAPE_MEMORY_MB', 1024))
+
+# The function the child process runs, as module:function
+DEFAULT_TARGET = 'scrapp:scrape_student_data'
+
+POLL_SECONDS = 0.5
+
+# How long a finished scrape's process may keep running to write its debug pages
+FLUSH_GRACE_SECONDS = 15
+
+class ScrapeAborted(Exception):
+    """The watchdog stopped a scrape; reason is 'timeout', 'memory' or 'crashed'"""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+def run_isolated(roll_number, password, previous_fingerprint=None, timeout=None, memory_limit_mb=None,
+                 target=DEFAULT_TARGET):
+    """Run target(roll_number, password, previous_fingerprint) in a watched subprocess and return its result"""
+    timeout = TIMEOUT_SECONDS if timeout is None else timeout
+    memory_limit_mb = MEMORY_LIMIT_MB if memory_limit_mb is None else memory_limit_mb
+
+    if os.name == 'nt':
+        isolation = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        isolation = {'start_new_session': True}
+    child = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), target],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        cwd=os.path.dirname(os.path.abspath(__file__)), **isolation
+    )
+
+    # The result is read on a helper thread while this one watches the clock. The child closes
+    # its result pipe as soon as the result is written, so EOF arrives before it exits.
+    payload = json.dumps([roll_number, password, previous_fingerprint]).encode()
+    output = {}
+
+    def exchange():
+        try:
+            child.stdin.write(payload)
+            child.stdin.close()
+        except OSError:
+            pass  # the child died before reading its arguments
+        with child.stdout:
+            output['stdout'] = child.stdout.read()
+
+    reader = threading.Thread(target=exchange)
+    reader.daemon = True
+    reader.start()
+
+    started = time.monotonic()
+    abort = None
+    finished = False
+    try:
+        while reader.is_alive():
+            reader.join(POLL_SECONDS)
+            if not reader.is_alive():
+                break
+            if time.monotonic() - started > timeout:
+                abort = ScrapeAborted('timeout', f"Scrape did not finish within {timeout:g} seconds")
+            elif memory_limit_mb and memory_accounting_available() and tree_rss_mb(child.pid) > memory_limit_mb:
+                abort = ScrapeAborted('memory', f"Scrape exceeded the {memory_limit_mb:g} MB memory limit")
+            if abort:
+                break
+        finished = abort is None and not reader.is_alive() and bool(output.get('stdout'))
+    finally:
+        if finished:
+            # Writing debug pages is off the scrape's critical path: the child gets a grace period
+            # in the background before its tree is killed
+            reaper = threading.Thread(target=reap, args=(child,))
+            reaper.daemon = True
+            reaper.start()
+        else:
+            # Also if watching failed: a crashed driver can leave Chrome running
+            kill_tree(child.pid)
+            child.wait()
+            reader.join()
+
+    if abort:
+        metrics.increment(f'scrape.killed.{abort.reason}')
+        print(f"Watchdog killed the scrape for {roll_number}: {abort}")
+        raise abort
+    if not finished:
+        raise ScrapeAborted('crashed', f"Scrape process exited with status {child.returncode}")
+    try:
+        return json.loads(output['stdout'])
+    except ValueError:
+        raise ScrapeAborted('crashed', "Scrape process returned malformed output") from None
+
+def reap(child):
+    """Let a child that already returned its result exit on its own, then kill whatever is left of its tree"""
+    deadline = time.monotonic() + FLUSH_GRACE_SECONDS
+    while not has_exited(child):
+        if time.monotonic() > deadline:
+            metrics.increment('scrape.killed.flush')
+            break
+        time.sleep(POLL_SECONDS)
+    kill_tree(child.pid)
+    child.wait()
+
+def has_exited(child):
+    """Check for exit without reaping the child, so its pid can't be reused before kill_tree()"""
+    if hasattr(os, 'waitid'):
+        return os.waitid(os.P_PID, child.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is not None
+    return child.poll() is not None
+
+def memory_accounting_available():
+    """Process memory is read from /proc; elsewhere (Windows, macOS) no memory limit is applied"""
+    return os.path.isdir('/proc') and hasattr(os, 'sysconf')
+
+def session_members(session_id):
+    """PIDs of all processes in a session, read from /proc (empty where there is no /proc)"""
+    members = []
+    if not os.path.isdir('/proc'):
+        return members
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        fields = read_stat(entry)
+        if fields and int(fields[3]) == session_id:
+            members.append(int(entry))
+    return members
+
+def read_stat(pid):
+    """Fields of /proc/<pid>/stat after the command name, or None if the process is gone"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name is in parentheses and may itself contain spaces
+    return stat[stat.rfind(')') + 2:].split()
+
+def tree_rss_mb(session_id):
+    """Resident memory of every process in the scrape's session, in MB"""
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    total = 0
+    for pid in session_members(session_id):
+        fields = read_stat(pid)
+        if fields:
+            total += int(fields[21]) * page_size
+    return total / 1024 / 1024
+
+def kill_tree(pid):
+    """Kill a scrape child and everything it started"""
+    if os.name == 'nt':
+        subprocess.run(['taskkill', '/T', '/F', '/PID', str(pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    # Anything that moved to its own process group is still in the session
+    for member in session_members(pid):
+        try:
+            os.kill(member, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+def child_main(target):
+    """Subprocess side: read the arguments from stdin, run the scrape and write its result to stdout"""
+    # Keep fd 1 for the result; the scraper's prints and Chrome's output go to stderr
+    result_pipe = os.fdopen(os.dup(1), 'w')
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    arguments = json.loads(sys.stdin.read())
+    module_name, function_name = target.split(':')
+    function = getattr(importlib.import_module(module_name), function_name)
+    result = function(*arguments)
+    json.dump(result, result_pipe)
+    result_pipe.close()
+
+    # Archived debug pages are written by a background thread that dies with this process;
+    # the parent already has the result and gives this FLUSH_GRACE_SECONDS
+    if 'debug_capture' in sys.modules:
+        sys.modules['debug_capture'].flush(timeout=10)
+
+if __name__ == "__main__":
+    child_main(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TARGET)
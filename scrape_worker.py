@@ -0,0 +1,106 @@
+"""
+Standalone scrape worker
+Claims jobs from the scrape_jobs table under a lease, runs the scrape and commits the
+results through the same code path as the web app. Start as many workers as there are
+machines (or Chrome instances) to spare; each runs one scrape at a time:
+
+    ERP_DB_URL=postgresql://... ERP_CREDENTIAL_KEY=... python scrape_worker.py
+
+While a job runs, a heartbeat thread keeps extending its lease. A worker that dies
+stops heartbeating, its lease expires and another worker picks the job up again.
+SIGTERM/SIGINT drain the worker: it finishes the current job and then exits.
+"""
+
+import argparse
+import os
+import signal
+import socket
+import threading
+import uuid
+
+import metrics
+from connectdb import ensure_schema, claim_scrape_job, heartbeat_scrape_job, finish_scrape_job
+from credentials import decrypt_password
+
+# Failed scrapes with attempts left are retried after this many seconds
+RETRY_DELAY_SECONDS = 60
+
+class ScrapeWorker:
+    """Claims and runs scrape jobs until drained"""
+
+    def __init__(self, worker_id=None, lease_seconds=180, poll_seconds=5):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self._draining = threading.Event()
+
+    def drain(self, *_):
+        """Stop claiming new jobs; the current one is finished first"""
+        if not self._draining.is_set():
+            print(f"Worker {self.worker_id} draining...")
+        self._draining.set()
+
+    def run(self):
+        """Claim and run jobs until drain() is called"""
+        signal.signal(signal.SIGTERM, self.drain)
+        signal.signal(signal.SIGINT, self.drain)
+        print(f"Worker {self.worker_id} started (lease {self.lease_seconds}s)")
+        while not self._draining.is_set():
+            job = claim_scrape_job(self.worker_id, self.lease_seconds)
+            if job is None:
+                self._draining.wait(self.poll_seconds)
+                continue
+            self.process(job)
+        print(f"Worker {self.worker_id} stopped")
+
+    def process(self, job):
+        """Run one leased job, heartbeating until it finishes"""
+        # Imported here so the scraper and Flask app are only loaded by processes that run jobs
+        from app import scrape_data_background, scraping_status
+
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job['id'], stop_heartbeat), daemon=True)
+        heartbeat.start()
+        try:
+            password = decrypt_password(job['encrypted_password'])
+            scrape_data_background(job['roll_number'], password)
+            result = scraping_status.pop(job['roll_number'], {})
+        except Exception as e:
+            result = {'status': 'error', 'message': str(e)}
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+
+        if result.get('status') == 'completed':
+            finish_scrape_job(job['id'], self.worker_id, True)
+            metrics.increment('worker.jobs_done')
+        elif result.get('login_failed'):
+            # The ERP rejected the password; retrying it could lock the student's ERP account
+            message = result.get('message', 'ERP login failed')
+            finish_scrape_job(job['id'], self.worker_id, False, message)
+            metrics.increment('worker.jobs_failed')
+            print(f"Job {job['id']} for {job['roll_number']} failed without retry: {message}")
+        else:
+            message = result.get('message', 'Scrape did not complete')
+            finish_scrape_job(job['id'], self.worker_id, False, message, retry_delay=RETRY_DELAY_SECONDS)
+            metrics.increment('worker.jobs_failed')
+            print(f"Job {job['id']} for {job['roll_number']} failed (attempt {job['attempts']}): {message}")
+
+    def _heartbeat(self, job_id, stop):
+        while not stop.wait(self.lease_seconds / 3):
+            if not heartbeat_scrape_job(job_id, self.worker_id, self.lease_seconds):
+                print(f"Worker {self.worker_id} lost the lease on job {job_id}")
+                return
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a scrape worker')
+    parser.add_argument('--worker-id', help='defaults to host-pid-random')
+    parser.add_argument('--lease-seconds', type=float, default=180)
+    parser.add_argument('--poll-seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    ensure_schema()
+    ScrapeWorker(args.worker_id, args.lease_seconds, args.poll_seconds).run()
+
+if __name__ == "__main__":
+    main()
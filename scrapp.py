@@ -1,15 +1,13 @@
-# pandas import moved to function level to avoid import errors
-
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
+# pandas, selenium and bs4 imports are at function level so importing this module
+# stays cheap; they are only loaded by the process that actually runs a scrape
+
+import os
 import time
 import re
 import csv
-from werkzeug.security import generate_password_hash
+import hashlib
+
+from debug_capture import capture_page
 
 # ##############################################################################
 # CONFIGURATION
@@ -18,23 +16,113 @@ from werkzeug.security import generate_password_hash
 LOGIN_URL = "https://campus.srmcem.ac.in/psp/ps/?cmd=login"
 ATTENDANCE_URL = "https://campus.srmcem.ac.in/psp/ps/EMPLOYEE/HRMS/c/MANAGE_ACADEMIC_RECORDS.STDNT_ATTEND_TERM.GBL"
 
-def scrape_student_data(roll_number, password):
+# Spans read by extract_student_info(); together with the STDNT_ENRL table they are
+# everything we store, so they are what the page fingerprint covers
+SUMMARY_SPAN_IDS = [
+    "PERSONAL_DTSAVW_NAME",
+    "INSTITUTION_TBL_DESCR",
+    "ACAD_CAR_TBL_DESCR",
+    "TERM_VAL_TBL_DESCR",
+    "SRM_LEAVE_WRK_AMOUNT_DUE",
+    "SRM_LEAVE_WRK_AMOUNT_DIFF",
+    "SRM_CLAS_PER_DR_TOTAL_PERCENT",
+]
+
+# Collects the fingerprinted sections in one round trip to the browser
+FINGERPRINT_SCRIPT = """
+const table = document.querySelector("table[id*='STDNT_ENRL']");
+const spans = arguments[0].map(id => {
+    const element = document.getElementById(id);
+    return element ? element.textContent.trim() : '';
+});
+return [table ? table.outerHTML : ''].concat(spans);
+"""
+
+# "lean" blocks assets and trims Chrome down to what the scrape needs; "legacy" is the
+# original profile, kept for comparison (see benchmarks/bench_scrape_profiles.py)
+SCRAPE_PROFILE = os.environ.get("ERP_SCRAPE_PROFILE", "lean")
+
+# Assets we never read. Scripts are not blocked: PeopleSoft needs them to log in and
+# to load the attendance table.
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.bmp", "*.webp",
+    "*.css", "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp3", "*.mp4", "*.webm",
+]
+
+LEAN_CHROME_ARGUMENTS = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-translate",
+    "--metrics-recording-only",
+    "--no-first-run",
+    "--mute-audio",
+    "--renderer-process-limit=1",
+    "--js-flags=--max-old-space-size=256",
+]
+
+def build_chrome_options(profile=None):
+    """Build Chrome options for the given scrape profile ('lean' or 'legacy')"""
+    from selenium.webdriver.chrome.options import Options
+
+    profile = profile or SCRAPE_PROFILE
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+
+    if profile == "lean":
+        for argument in LEAN_CHROME_ARGUMENTS:
+            chrome_options.add_argument(argument)
+        # Return once the DOM is ready instead of waiting for every subresource
+        chrome_options.page_load_strategy = "eager"
+        chrome_options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.fonts": 2,
+            "profile.managed_default_content_settings.media_stream": 2,
+            "profile.default_content_setting_values.notifications": 2,
+        })
+    return chrome_options
+
+def apply_resource_blocking(driver, profile=None):
+    """Block non-essential asset requests through the DevTools protocol"""
+    if (profile or SCRAPE_PROFILE) != "lean":
+        return
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+
+def fingerprint_page(table_html, summary_texts):
+    """Hash the attendance table and summary spans so an unchanged page can be skipped"""
+    digest = hashlib.sha256(table_html.encode("utf-8"))
+    for text in summary_texts:
+        digest.update(b"\0" + text.encode("utf-8"))
+    return digest.hexdigest()
+
+def scrape_student_data(roll_number, password, previous_fingerprint=None):
     """
     Scrape attendance data for a single student
-    Returns a dictionary with student info and attendance records
+    Returns a dictionary with student info and attendance records,
+    {'unchanged': True, 'fingerprint': ...} when the page matches previous_fingerprint, or
+    {'login_failed': True} when the ERP turned the credentials away
     """
+    from selenium import webdriver
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from bs4 import BeautifulSoup
+
     driver = None
     try:
-        # Set up Chrome options for headless mode
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
-        
-        # Initialize Chrome
-        driver = webdriver.Chrome(options=chrome_options)
+        # Initialize headless Chrome with the configured scrape profile
+        driver = webdriver.Chrome(options=build_chrome_options())
+        apply_resource_blocking(driver)
         wait = WebDriverWait(driver, 30)
 
         print(f"Scraping data for {roll_number}...")
@@ -49,8 +137,14 @@ def scrape_student_data(roll_number, password):
         password_field.send_keys(password)
         login_button.click()
 
-        # Wait for dashboard
-        wait.until(EC.presence_of_element_located((By.ID, "pthnavcontainer")))
+        # Wait for dashboard; if the login form is still showing, the password was rejected
+        try:
+            wait.until(EC.presence_of_element_located((By.ID, "pthnavcontainer")))
+        except TimeoutException:
+            if driver.find_elements(By.ID, "userid"):
+                print(f"ERP login failed for {roll_number}.")
+                return {'login_failed': True}
+            raise
         print("Login successful. Navigating to attendance page...")
 
         driver.get(ATTENDANCE_URL)
@@ -71,13 +165,21 @@ def scrape_student_data(roll_number, password):
                 print("Switched to first iframe.")
 
         # --- 3. WAIT FOR TABLE ---
-        Result = driver.find_element(By.ID, "RESULT3$0")
+        # With the eager page-load strategy the frame may still be loading, so wait for the link
+        Result = wait.until(EC.element_to_be_clickable((By.ID, "RESULT3$0")))
         Result.click()
         print("Waiting for attendance table...")
         wait.until(EC.presence_of_element_located((By.XPATH, "//table[contains(@id,'STDNT_ENRL')]")))
         print("Attendance table found!")
 
-        # --- 4. SCRAPE DATA ---
+        # --- 4. SKIP UNCHANGED PAGES ---
+        sections = driver.execute_script(FINGERPRINT_SCRIPT, SUMMARY_SPAN_IDS)
+        fingerprint = fingerprint_page(sections[0], sections[1:])
+        if fingerprint == previous_fingerprint:
+            print(f"Attendance page for {roll_number} is unchanged, skipping parse.")
+            return {'unchanged': True, 'fingerprint': fingerprint}
+
+        # --- 5. SCRAPE DATA ---
         page_html = driver.page_source
         soup = BeautifulSoup(page_html, "html.parser")
         
@@ -87,20 +189,24 @@ def scrape_student_data(roll_number, password):
         # Extract attendance records
         attendance_records = extract_attendance_records(soup)
         
-        # Save debug page
-        with open(f"debug_page_{roll_number}.html", "w", encoding="utf-8") as f:
-            f.write(page_html)
-        print(f"Saved debug_page_{roll_number}.html for inspection.")
+        # Archive a sample of pages for debugging (written on a background thread)
+        capture_page(roll_number, page_html)
 
         return {
             'student_info': student_info,
             'records': attendance_records,
             'total_attendance': student_info.get('total_attendance_percent', 0),
-            'medical_attendance': student_info.get('medical_attendance_percent', 0)
+            'medical_attendance': student_info.get('medical_attendance_percent', 0),
+            'fingerprint': fingerprint
         }
 
     except Exception as e:
         print(f"An error occurred while scraping data for {roll_number}: {e}")
+        if driver:
+            try:
+                capture_page(roll_number, driver.page_source, failed=True, reason=str(e))
+            except Exception:
+                pass
         return None
 
     finally:
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test script for the guards in front of scrapes
+Drives the ERP circuit breaker through open -> half-open -> closed/re-opened, and checks
+that admission control's token buckets refill and give tokens back.
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from admission import TokenBuckets, AdmissionControl
+
+def tripped_breaker(**options):
+    """A breaker with short timings, opened by a run of failed scrapes"""
+    breaker = CircuitBreaker('test', min_calls=3, failure_rate=0.5, cooldown_seconds=0.2, **options)
+    for _ in range(3):
+        assert breaker.allow_request()
+        breaker.record_failure(1)
+    assert breaker.state == OPEN, breaker.state
+    return breaker
+
+def test_breaker_opens_and_closes():
+    """Failures open the breaker; after the cooldown one successful probe closes it"""
+    print("🧪 Testing breaker open -> half-open -> closed...")
+    breaker = CircuitBreaker('test', min_calls=3, failure_rate=0.5, cooldown_seconds=0.2)
+    breaker.record_success(1)
+    breaker.record_failure(1)
+    assert breaker.state == CLOSED, "opened before min_calls"
+    breaker.record_failure(1)
+    assert breaker.state == OPEN, breaker.state
+    assert not breaker.allow_request(), "open breaker let a scrape through"
+
+    time.sleep(0.25)
+    assert breaker.state == HALF_OPEN, breaker.state
+    assert breaker.allow_request(), "no probe after the cooldown"
+    assert not breaker.allow_request(), "a second probe was let through"
+    breaker.record_success(1)
+    assert breaker.state == CLOSED, breaker.state
+    assert breaker.allow_request()
+    print("✅ Opened, probed once and closed")
+
+def test_breaker_reopens_on_failed_probe():
+    """A failed or slow probe opens the breaker for another cooldown"""
+    print("🧪 Testing breaker re-open...")
+    breaker = tripped_breaker(slow_call_seconds=5)
+    time.sleep(0.25)
+    assert breaker.allow_request()
+    breaker.record_failure(1)
+    assert breaker.state == OPEN, breaker.state
+
+    time.sleep(0.25)
+    assert breaker.allow_request()
+    breaker.record_success(10)  # returned data, but slower than slow_call_seconds
+    assert breaker.state == OPEN, "slow probe closed the breaker"
+    print("✅ Failed and slow probes re-open the breaker")
+
+def test_breaker_frees_lost_probe():
+    """A probe that never reports back gives its slot up after probe_timeout_seconds"""
+    print("🧪 Testing lost probe...")
+    breaker = tripped_breaker(probe_timeout_seconds=0.2)
+    time.sleep(0.25)
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    time.sleep(0.25)
+    assert breaker.allow_request(), "lost probe kept the breaker half-open forever"
+    breaker.record_success(1)
+    assert breaker.state == CLOSED, breaker.state
+    print("✅ Lost probe slot was freed")
+
+def test_bucket_refill():
+    """A bucket allows `capacity` requests in a burst and refills evenly"""
+    print("🧪 Testing token bucket refill...")
+    buckets = TokenBuckets(capacity=3, refill_seconds=0.3)
+    assert all(buckets.take('10.0.0.1') for _ in range(3))
+    assert not buckets.take('10.0.0.1'), "burst larger than capacity"
+    assert buckets.take('10.0.0.2'), "buckets are not per key"
+
+    time.sleep(0.12)  # one token comes back every 0.1 s
+    assert buckets.take('10.0.0.1'), "bucket did not refill"
+    assert not buckets.take('10.0.0.1')
+
+    time.sleep(0.5)
+    assert all(buckets.take('10.0.0.1') for _ in range(3))
+    assert not buckets.take('10.0.0.1'), "refill went past capacity"
+    print("✅ Burst of 3, then refilled")
+
+def test_give_back():
+    """A token taken for a request rejected by a later check is returned"""
+    print("🧪 Testing give_back...")
+    admission = AdmissionControl(ip_burst=2, ip_refill_seconds=3600, roll_burst=1, roll_refill_seconds=3600,
+                                 max_pending=5)
+    assert admission.admit('10.0.0.1', 'BE23CS001', pending=0) is None
+    assert admission.admit('10.0.0.1', 'BE23CS001', pending=0) == 'roll'
+    # The roll-number rejection gave the IP token back, so the IP can still start one scrape
+    assert admission.admit('10.0.0.1', 'BE23CS002', pending=0) is None
+    assert admission.admit('10.0.0.1', 'BE23CS003', pending=0) == 'ip'
+    assert admission.admit('10.0.0.9', 'BE23CS009', pending=5) == 'pending'
+    assert admission.admit('10.0.0.9', 'BE23CS009', pending=4) is None, "pending rejection used up tokens"
+
+    buckets = TokenBuckets(capacity=2, refill_seconds=3600)
+    buckets.give_back('10.0.0.1')
+    assert buckets.take('10.0.0.1') and buckets.take('10.0.0.1')
+    assert not buckets.take('10.0.0.1'), "give_back on a full bucket went past capacity"
+    print("✅ Tokens given back, never past capacity")
+
+def main():
+    """Run all tests"""
+    test_breaker_opens_and_closes()
+    test_breaker_reopens_on_failed_probe()
+    test_breaker_frees_lost_probe()
+    test_bucket_refill()
+    test_give_back()
+    print("\n🎉 ALL ADMISSION TESTS PASSED!")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
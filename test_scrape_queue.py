@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test script for the lease-based scrape job queue
+Runs against a throwaway SQLite database (or ERP_DB_URL when it points at PostgreSQL):
+claims are exclusive, expired leases are reclaimed, a worker that lost its lease can't
+finish the job, and failed jobs are retried until max_attempts.
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import connectdb
+from connectdb import (init_db, add_student, get_student, enqueue_scrape_job, claim_scrape_job,
+                       heartbeat_scrape_job, finish_scrape_job, get_latest_scrape_job)
+
+_tmp = None
+
+def use_test_database():
+    """Point connectdb at a throwaway SQLite file (unless ERP_DB_URL selects PostgreSQL), once"""
+    global _tmp
+    if _tmp is None:
+        _tmp = tempfile.TemporaryDirectory()
+        if not connectdb.DB_URL.startswith(('postgresql://', 'postgres://')):
+            connectdb.use_backend(os.path.join(_tmp.name, 'test_queue.db'))
+        init_db()
+
+def new_job(roll_number, max_attempts=3):
+    """Enqueue a job for a fresh student; returns the job id"""
+    add_student(roll_number, 'x')
+    return enqueue_scrape_job(get_student(roll_number)['id'], roll_number, 'encrypted', max_attempts)
+
+def job_row(job_id):
+    conn = connectdb.get_db_connection()
+    job = conn.execute('SELECT * FROM scrape_jobs WHERE id = ?', (job_id,)).fetchone()
+    conn.close()
+    return job
+
+def drain_queue():
+    """Finish whatever earlier tests left runnable so each test sees only its own jobs"""
+    use_test_database()
+    while True:
+        job = claim_scrape_job('cleanup', 60)
+        if job is None:
+            return
+        finish_scrape_job(job['id'], 'cleanup', True)
+
+def test_claim_is_exclusive():
+    """Only one worker gets a job, even when several claim at the same moment"""
+    print("🧪 Testing claim exclusivity...")
+    drain_queue()
+    job_ids = [new_job(f"BE23CS1{n:02d}") for n in range(10)]
+    assert enqueue_scrape_job(get_student('BE23CS100')['id'], 'BE23CS100', 'encrypted') == job_ids[0], \
+        "an unfinished job should be reused"
+
+    claimed = []
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        while True:
+            job = claim_scrape_job(worker_id, 60)
+            if job is None:
+                return
+            with lock:
+                claimed.append((job['id'], worker_id))
+
+    threads = [threading.Thread(target=worker, args=(f"worker-{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = sorted(job_id for job_id, _ in claimed)
+    assert ids == sorted(job_ids), f"claimed {ids}, expected each of {job_ids} once"
+    for job_id, worker_id in claimed:
+        assert job_row(job_id)['lease_owner'] == worker_id
+    print(f"✅ {len(ids)} jobs claimed once each by {len({w for _, w in claimed})} workers")
+
+def test_expired_lease_is_reclaimed():
+    """A job whose worker stopped heartbeating goes to another worker, counting the attempt"""
+    print("🧪 Testing expired lease reclaim...")
+    drain_queue()
+    job_id = new_job('BE23CS200')
+
+    first = claim_scrape_job('worker-a', 0.2)
+    assert first['id'] == job_id and first['attempts'] == 1, dict(first)
+    assert claim_scrape_job('worker-b', 60) is None, "a live lease must not be reclaimed"
+
+    time.sleep(0.3)
+    second = claim_scrape_job('worker-b', 60)
+    assert second is not None and second['id'] == job_id, "expired lease was not reclaimed"
+    assert second['attempts'] == 2 and second['lease_owner'] == 'worker-b', dict(second)
+    print("✅ Reclaimed by worker-b on attempt 2")
+
+    # worker-a wakes up late: it can neither extend nor finish the job any more
+    assert not heartbeat_scrape_job(job_id, 'worker-a', 60), "stale worker extended the lease"
+    finish_scrape_job(job_id, 'worker-a', True)
+    job = job_row(job_id)
+    assert job['status'] == 'running' and job['lease_owner'] == 'worker-b', dict(job)
+    print("✅ finish_scrape_job from the worker that lost the lease is a no-op")
+
+    assert heartbeat_scrape_job(job_id, 'worker-b', 60)
+    finish_scrape_job(job_id, 'worker-b', True)
+    job = job_row(job_id)
+    assert job['status'] == 'done' and job['encrypted_password'] is None, dict(job)
+    print("✅ Lease holder finished the job and the password was dropped")
+
+def test_retry_until_max_attempts():
+    """A failing job is queued again after its retry delay, then fails for good"""
+    print("🧪 Testing retries...")
+    drain_queue()
+    job_id = new_job('BE23CS300', max_attempts=3)
+
+    for attempt in range(1, 4):
+        job = claim_scrape_job('worker-a', 60)
+        assert job is not None and job['id'] == job_id and job['attempts'] == attempt, attempt
+        finish_scrape_job(job_id, 'worker-a', False, f"failure {attempt}", retry_delay=0.2)
+        if attempt < 3:
+            assert job_row(job_id)['status'] == 'queued'
+            assert claim_scrape_job('worker-a', 60) is None, "retried before its delay"
+            time.sleep(0.25)
+
+    job = job_row(job_id)
+    assert job['status'] == 'failed' and job['error'] == 'failure 3', dict(job)
+    assert job['encrypted_password'] is None
+    assert get_latest_scrape_job(get_student('BE23CS300')['id'])['status'] == 'failed'
+    assert claim_scrape_job('worker-a', 60) is None
+    print("✅ Failed for good after 3 attempts")
+
+    # A lease that expires on the last attempt is given up on as well
+    job_id = new_job('BE23CS301', max_attempts=1)
+    claim_scrape_job('worker-a', 0.1)
+    time.sleep(0.2)
+    assert claim_scrape_job('worker-b', 60) is None
+    job = job_row(job_id)
+    assert job['status'] == 'failed' and job['error'] == 'Lease expired', dict(job)
+    print("✅ Expired lease on the last attempt marks the job failed")
+
+def main():
+    """Run all tests"""
+    test_claim_is_exclusive()
+    test_expired_lease_is_reclaimed()
+    test_retry_until_max_attempts()
+    print("\n🎉 ALL SCRAPE QUEUE TESTS PASSED!")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
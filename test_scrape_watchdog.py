@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script for the scrape watchdog
+Runs stand-in scrapers in the watched subprocess: one that hangs like a stuck chromedriver
+(with a driver and a detached browser child), one that eats memory, and one that works.
+"""
+
+import sys
+import os
+import subprocess
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from scrape_watchdog import run_isolated, read_stat, ScrapeAborted
+
+# The hanging scraper writes the PIDs of its stand-in driver and browser here
+PID_FILE_VARIABLE = 'WATCHDOG_TEST_PID_FILE'
+
+def hanging_driver(roll_number, password, previous_fingerprint):
+    """Start a 'chromedriver' and a 'Chrome' in its own process group, then hang"""
+    sleeper = [sys.executable, '-c', 'import time; time.sleep(600)']
+    driver = subprocess.Popen(sleeper)
+    browser = subprocess.Popen(sleeper, preexec_fn=os.setpgrp)
+    with open(os.environ[PID_FILE_VARIABLE], 'w') as f:
+        f.write(f"{driver.pid} {browser.pid}")
+    time.sleep(600)
+
+def greedy_driver(roll_number, password, previous_fingerprint):
+    """Hold on to far more memory than the limit allows"""
+    hog = bytearray(400 * 1024 * 1024)
+    time.sleep(600)
+    return len(hog)
+
+def working_driver(roll_number, password, previous_fingerprint):
+    """Return a result the way scrapp.scrape_student_data does, printing along the way"""
+    print(f"Scraping data for {roll_number}...")
+    return {'student_info': {'name': 'Test Student'}, 'records': [], 'password_length': len(password)}
+
+def slow_flush_driver(roll_number, password, previous_fingerprint):
+    """Return at once, but leave work behind that keeps the process alive, like debug_capture.flush()"""
+    threading.Thread(target=time.sleep, args=(4,)).start()
+    return {'records': []}
+
+def is_gone(pid):
+    """A killed process is either reaped already or a zombie waiting for its new parent"""
+    fields = read_stat(pid)
+    return fields is None or fields[0] in ('Z', 'X')
+
+def test_hanging_driver_is_killed():
+    """A scrape that never returns is killed at its deadline, driver and browser included"""
+    print("🧪 Testing hanging driver...")
+    with tempfile.NamedTemporaryFile('r', suffix='.pids') as pid_file:
+        os.environ[PID_FILE_VARIABLE] = pid_file.name
+        started = time.monotonic()
+        try:
+            run_isolated('BE23CS999', 'test123', timeout=3, target='test_scrape_watchdog:hanging_driver')
+            raise AssertionError("hanging scrape was not aborted")
+        except ScrapeAborted as e:
+            assert e.reason == 'timeout', e.reason
+            print(f"✅ Aborted: {e}")
+        elapsed = time.monotonic() - started
+        assert elapsed < 6, f"took {elapsed:.1f} s"
+
+        time.sleep(0.2)
+        pids = [int(pid) for pid in pid_file.read().split()]
+        assert len(pids) == 2, pids
+        for pid in pids:
+            assert is_gone(pid), f"process {pid} is still running"
+        print(f"✅ Driver and browser processes {pids} were killed after {elapsed:.1f} s")
+
+def test_memory_limit():
+    """A scrape whose process tree outgrows the memory limit is killed"""
+    print("🧪 Testing memory limit...")
+    if not os.path.isdir('/proc'):
+        print("⏭️  Skipped: memory is read from /proc")
+        return
+    try:
+        run_isolated('BE23CS999', 'test123', timeout=30, memory_limit_mb=150,
+                     target='test_scrape_watchdog:greedy_driver')
+        raise AssertionError("greedy scrape was not aborted")
+    except ScrapeAborted as e:
+        assert e.reason == 'memory', e.reason
+        print(f"✅ Aborted: {e}")
+
+def test_working_scrape():
+    """A normal scrape's result comes back intact, with its prints kept out of the result"""
+    print("🧪 Testing working scrape...")
+    result = run_isolated('BE23CS999', 'test123', timeout=30, target='test_scrape_watchdog:working_driver')
+    assert result == {'student_info': {'name': 'Test Student'}, 'records': [], 'password_length': 7}, result
+    print("✅ Result returned")
+
+def test_result_before_flush():
+    """The result comes back before the child exits, and the flush doesn't count against the deadline"""
+    print("🧪 Testing result before flush...")
+    started = time.monotonic()
+    result = run_isolated('BE23CS999', 'test123', timeout=2, target='test_scrape_watchdog:slow_flush_driver')
+    elapsed = time.monotonic() - started
+    assert result == {'records': []}, result
+    assert elapsed < 2, f"took {elapsed:.1f} s"
+    print(f"✅ Result returned after {elapsed:.1f} s while the child was still flushing")
+
+def main():
+    """Run all tests"""
+    test_hanging_driver_is_killed()
+    test_memory_limit()
+    test_working_scrape()
+    test_result_before_flush()
+    print("\n🎉 ALL WATCHDOG TESTS PASSED!")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())